@@ -0,0 +1,83 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import build_metrics
+from build_cache import CACHE_DIR, evict
+from build_maps import load_districts, load_scenario_attributes, district_layer_entry, build_page, measured
+from scenarios import SCENARIOS
+from stats_utils import CLASS_METHODS, class_count
+
+# Build one page per scenario and projection period (every period in the scenario's
+# `layers`) in a pool of processes, instead of one build after the other. The stages all
+# pages share (district geometry, simplification and tiles) are built once, here, into the
+# build cache before the pool starts. Each worker then memory-maps the reprojected geometry
+# from that cache entry's Arrow file once, rather than having it pickled over with every
+# job, and a job only maps its scenario's parameters and builds and writes its page. Wall time goes
+# down with the number of workers, up to one per job.
+# Usage: python batch_build.py [--scenarios ssp585 ssp245] [--periods 2021-2040 ...] [--jobs N] [--output-dir build]
+# writes <output-dir>/climate_map_<scenario>_<period>.html and its tiles.
+
+# The districts, loaded once per worker process
+_districts = None
+
+
+def _start_worker(cache_dir, metrics):
+    global _districts
+    if metrics:
+        build_metrics.start(metrics, worker=os.getpid())
+    _districts = load_districts(cache_dir=cache_dir)
+
+
+# Build the page of one scenario and period; returns its path and how long it took
+def build_job(key, period, output_path, cache_dir, classification, n_classes, telemetry):
+    start = time.perf_counter()
+    with build_metrics.stage('job', scenario=key, period=period):
+        attributes = load_scenario_attributes(key, _districts, cache_dir, period)
+        build_page(_districts, {key: attributes}, output_path, cache_dir, classification, n_classes, telemetry, period)
+    return output_path, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    all_periods = sorted({period for scenario in SCENARIOS.values() for period in scenario['layers']})
+    parser = argparse.ArgumentParser(description="Build a map page for every scenario and projection period in parallel")
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--periods', nargs='+', default=all_periods, choices=all_periods)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument('--output-dir', default='build')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="where to keep the build cache")
+    parser.add_argument('--classes', default='linear', choices=CLASS_METHODS, help="how to split each parameter into colours")
+    parser.add_argument('--num-classes', type=class_count, help="number of colours (default: 256 for linear, 7 otherwise)")
+    parser.add_argument('--telemetry', action='store_true', help="time every callback in the pages")
+    parser.add_argument('--metrics', help="append every stage's timing and memory to this file as JSON lines")
+    args = parser.parse_args()
+
+    jobs = [(key, period) for period in args.periods for key in args.scenarios if period in SCENARIOS[key]['layers']]
+    if not jobs:
+        parser.error("none of the scenarios has a layer for these periods")
+    workers = max(1, min(args.jobs, len(jobs)))
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.metrics:
+        build_metrics.start(args.metrics, batch=len(jobs), workers=workers)
+
+    start = time.perf_counter()
+    with build_metrics.stage('batch'):
+        districts = measured("district geometry", lambda: load_districts(cache_dir=args.cache_dir))
+        with build_metrics.stage('district layer'):
+            district_layer_entry(districts, args.cache_dir)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                 initargs=(args.cache_dir, args.metrics)) as pool:
+            futures = [pool.submit(build_job, key, period, os.path.join(args.output_dir, f"climate_map_{key}_{period}.html"),
+                                   args.cache_dir, args.classes, args.num_classes, args.telemetry)
+                       for key, period in jobs]
+            for future in as_completed(futures):
+                path, elapsed = future.result()
+                print(f"Wrote {path} ({elapsed:.1f} s)")
+    print(f"Built {len(jobs)} pages with {workers} workers in {time.perf_counter() - start:.1f} s")
+
+    removed = evict(args.cache_dir)
+    if removed:
+        print(f"Evicted {removed} stale cache entries")
+    build_metrics.stop()
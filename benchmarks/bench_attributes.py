@@ -0,0 +1,99 @@
+import base64
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geo_utils import to_float32_columns
+from scenarios import scenario_fields
+
+# Compare shipping the numeric district attributes as JSON properties with packed
+# little-endian float32 columns (base64, optionally gzipped the way Bokeh embeds NumPy arrays)
+# Usage: python benchmarks/bench_attributes.py [path/to/layer.dbf] [repeats]
+default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'SSP245&585_shp', 'SSP585_ClimateData_India.dbf')
+
+numeric_columns = list(scenario_fields('ssp585'))
+
+# Parse both payloads in Node.js, which is what the browser actually does on page load
+node_script = """
+const fs = require('fs');
+const [json_path, b64_path, columns, repeats] = process.argv.slice(1);
+const json_text = fs.readFileSync(json_path, 'utf8');
+const b64_text = fs.readFileSync(b64_path, 'utf8');
+function best(fn) {
+    let best = Infinity;
+    for (let r = 0; r < Number(repeats); r++) {
+        const start = process.hrtime.bigint();
+        fn();
+        best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e6);
+    }
+    return best;
+}
+const json_ms = best(() => JSON.parse(json_text));
+const b64_ms = best(() => {
+    const bytes = Buffer.from(b64_text, 'base64');
+    const all = new Float32Array(bytes.buffer, bytes.byteOffset, bytes.length / 4);
+    const n = all.length / Number(columns);
+    for (let c = 0; c < Number(columns); c++) {
+        all.subarray(c * n, (c + 1) * n);
+    }
+});
+console.log(JSON.stringify({json_ms, b64_ms}));
+"""
+
+
+def best_of(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else default_path
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    df = gpd.read_file(path, columns=numeric_columns, ignore_geometry=True).fillna(0)
+
+    # Today's transport: one JSON object of numbers per district
+    json_text = json.dumps(df[numeric_columns].to_dict('records'))
+    # New transport: every column packed back to back as float32
+    packed = b''.join(column.tobytes() for column in to_float32_columns(df, numeric_columns).values())
+    b64_text = base64.b64encode(packed).decode()
+    gzip_b64_text = base64.b64encode(gzip.compress(packed)).decode()
+
+    print(f"{os.path.basename(path)}: {len(df)} districts x {len(numeric_columns)} parameters")
+    print(f"JSON properties        : {len(json_text) / 1024:8.1f} KB")
+    print(f"float32 base64         : {len(b64_text) / 1024:8.1f} KB")
+    print(f"float32 gzip + base64  : {len(gzip_b64_text) / 1024:8.1f} KB")
+
+    json_time = best_of(lambda: json.loads(json_text), repeats)
+    b64_time = best_of(lambda: memoryview(base64.b64decode(b64_text)).cast('f'), repeats)
+    print(f"Python parse JSON      : {json_time * 1000:8.3f} ms")
+    print(f"Python decode float32  : {b64_time * 1000:8.3f} ms")
+
+    node = shutil.which('node')
+    if node:
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path, b64_path = os.path.join(tmp, 'props.json'), os.path.join(tmp, 'cols.b64')
+            with open(json_path, 'w') as f:
+                f.write(json_text)
+            with open(b64_path, 'w') as f:
+                f.write(b64_text)
+            result = subprocess.run([node, '-e', node_script, json_path, b64_path, str(len(numeric_columns)), str(repeats)],
+                                    capture_output=True, text=True, check=True)
+            timings = json.loads(result.stdout)
+        print(f"Node JSON.parse        : {timings['json_ms']:8.3f} ms")
+        print(f"Node Float32Array      : {timings['b64_ms']:8.3f} ms")
+    else:
+        print("node not found, skipping the JavaScript parse timings")
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from bokeh.embed.bundle import bundle_for_objs_and_resources
+from bokeh.embed.elements import html_page_for_render_items
+from bokeh.embed.util import standalone_docs_json_and_render_items
+from bokeh.resources import CDN
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from build_metrics import peak_rss
+from build_maps import KEYS, load_districts, load_scenario_attributes, district_layer_entry, build_document
+from geo_utils import transform_to_web_mercator, to_geojson
+from scenarios import GEOMETRY_PATH, PERIOD, SCENARIOS, scenario_fields, scenario_layer
+
+# Time and memory of every stage of the page build (reading the layers, categorising the
+# names, reprojecting, reading the parameters, the district layer and tile pyramid, GeoJSON,
+# the Bokeh document, its serialisation and the HTML write), on the real scenario layers
+# and on synthetic ones with every district split into about `scale` parts carrying `scale`
+# times the vertices: what a finer administrative level would cost. The synthetic layers
+# are made from the real ones and a fixed seed, so every run measures the same data.
+# Time is the best of `--repeats` runs, memory the peak resident memory of the process
+# during them (build_metrics.peak_rss, reset for every run: GDAL and Arrow allocations
+# included, as is whatever the earlier stages keep resident).
+# The district layer (shared-boundary simplification and tile pyramid) is the limit: on
+# synthetic data like ours it takes ~2 s at 1x, ~15 s at 10x and ~160 s at 100x (73k
+# districts, 18M vertices), where the embedded coarse level also makes a 31 MB page.
+# Usage: python benchmarks/bench_pipeline.py [--scales 1 10 100] [--repeats 3] [--output results.jsonl]
+
+
+# Split every district along a grid over its bounds into about `scale` parts, densified to
+# about `scale` times the vertices in all; returns the parts, the district each came from
+# and its number within that district
+def split_districts(geoms, scale):
+    columns = int(np.ceil(np.sqrt(scale)))
+    lines = int(np.ceil(scale / columns))
+    parts, rows, numbers = [], [], []
+    for i, geom in enumerate(geoms):
+        minx, miny, maxx, maxy = geom.bounds
+        xs, ys = np.linspace(minx, maxx, columns + 1), np.linspace(miny, maxy, lines + 1)
+        grid = shapely.box(xs[:-1, None], ys[None, :-1], xs[1:, None], ys[None, 1:]).ravel()
+        pieces = shapely.intersection(geom, grid)
+        pieces = pieces[np.isin(shapely.get_type_id(pieces), [3, 6]) & ~shapely.is_empty(pieces)]
+        parts.append(pieces)
+        rows.append(np.full(len(pieces), i))
+        numbers.append(np.arange(1, len(pieces) + 1))
+    parts = np.concatenate(parts)
+    vertices = len(shapely.get_coordinates(geoms)) * scale
+    parts = shapely.segmentize(parts, shapely.length(parts).sum() / vertices)
+    return parts, np.concatenate(rows), np.concatenate(numbers)
+
+
+# Write the geometry layer and every scenario's layer scaled by `scale` into `directory`,
+# all with the same parts, named '<district> <n>'. Parts keep their district's parameters,
+# each value varied by a few percent. Returns the geometry path and {scenario: path}.
+def write_scaled_layers(scale, directory, seed=0):
+    rng = np.random.default_rng(seed)
+    districts = gpd.read_file(GEOMETRY_PATH, columns=KEYS, engine='pyogrio', use_arrow=True)
+    parts, rows, numbers = split_districts(districts.geometry.values, scale)
+    names = districts[KEYS].iloc[rows].reset_index(drop=True)
+    names['District'] = names['District'].astype(str) + ' ' + numbers.astype(str)
+
+    def write(attributes, path):
+        gpd.GeoDataFrame(attributes, geometry=parts, crs=districts.crs).to_file(path, engine='pyogrio')
+        return path
+
+    geometry_path = write(names, os.path.join(directory, 'districts.shp'))
+    paths = {}
+    for key in SCENARIOS:
+        codes = list(scenario_fields(key))
+        attributes = gpd.read_file(scenario_layer(key), columns=KEYS + codes, ignore_geometry=True, engine='pyogrio')
+        attributes = attributes.drop_duplicates(KEYS).set_index(KEYS).reindex(pd.MultiIndex.from_frame(districts[KEYS]))
+        values = attributes[codes].to_numpy(dtype=float)[rows] * rng.normal(1, 0.05, (len(rows), len(codes)))
+        paths[key] = write(names.assign(**dict(zip(codes, values.T))), os.path.join(directory, f'{key}.shp'))
+    return geometry_path, paths
+
+
+# Best time of `run()` and the highest peak resident memory of the process in its runs
+def measure(run, repeats):
+    timings, peaks = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result, peak = peak_rss(run)
+        timings.append(time.perf_counter() - start)
+        peaks.append(peak)
+    return min(timings), max(peaks), result
+
+
+# Every stage of the build on the district layer at `geometry_path` and the scenario layers
+# in SCENARIOS: {stage: (seconds, peak bytes)}
+def bench_stages(geometry_path, repeats, workdir):
+    stages = {}
+
+    def stage(name, run):
+        elapsed, peak, result = measure(run, repeats)
+        stages[name] = (elapsed, peak)
+        print(f"  {name:<22} {elapsed * 1000:>10.1f} ms {peak / 2**20:>10.1f} MB")
+        return result
+
+    gdf = stage('read_file', lambda: gpd.read_file(geometry_path, columns=KEYS, engine='pyogrio', use_arrow=True))
+    stage('categorise', lambda: gdf[KEYS].astype('category'))
+    mercator = stage('reproject', lambda: transform_to_web_mercator(gdf.copy()))
+    stage('to_geojson (full)', lambda: len(to_geojson(mercator)))
+    # Only keep what the later stages use: at 100x the frames above take about a GB
+    del gdf, mercator
+
+    # The cached stages, each run in a cache of its own so every run builds; the cache is
+    # deleted while its layers are in use, so they are read into memory instead of mapped
+    def uncached(build):
+        def run():
+            cache_dir = tempfile.mkdtemp(dir=workdir)
+            try:
+                return build(cache_dir)
+            finally:
+                shutil.rmtree(cache_dir)
+        return run
+    districts = stage('districts', uncached(lambda cache_dir: load_districts(geometry_path, cache_dir, memory_map=False)))
+    scenario_attributes = stage('attributes', uncached(lambda cache_dir: {
+        key: load_scenario_attributes(key, districts, cache_dir, memory_map=False) for key in SCENARIOS}))
+    stage('district layer', uncached(lambda cache_dir: district_layer_entry(districts, cache_dir)))
+    # From here on the district layer comes from the cache
+    cache_dir = tempfile.mkdtemp(dir=workdir)
+    district_layer_entry(districts, cache_dir)
+    basename = os.path.join(workdir, 'climate_map')
+    doc = stage('document', lambda: build_document(districts, scenario_attributes, basename, cache_dir))
+    docs_json, render_items = stage('serialise', lambda: standalone_docs_json_and_render_items(doc.roots))
+
+    def write_html():
+        html = html_page_for_render_items(bundle_for_objs_and_resources([doc], CDN), docs_json, render_items,
+                                          title="Climate Data Map")
+        with open(basename + '.html', 'w', encoding='utf-8') as f:
+            f.write(html)
+        return len(html)
+    size = stage('html', write_html)
+    print(f"  {'page size':<22} {size / 2**20:>10.2f} MB")
+    return stages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time and memory-profile every stage of the page build")
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10, 100],
+                        help="district layers to run on: 1 is the real one, N splits every district into ~N parts")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="append every scale's results to this file as a JSON line")
+    args = parser.parse_args()
+
+    real = {key: scenario_layer(key) for key in SCENARIOS}
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            geometry_path, paths = (GEOMETRY_PATH, real) if scale == 1 else write_scaled_layers(scale, workdir, args.seed)
+            layer = gpd.read_file(geometry_path, columns=[], engine='pyogrio', use_arrow=True)
+            polygons, vertices = len(layer), len(shapely.get_coordinates(layer.geometry.values))
+            print(f"Scale {scale}: {polygons} districts, {vertices} vertices")
+            # The build reads the scenario layers through SCENARIOS
+            for key, path in paths.items():
+                SCENARIOS[key]['layers'][PERIOD] = path
+            try:
+                stages = bench_stages(geometry_path, args.repeats, workdir)
+            finally:
+                for key, path in real.items():
+                    SCENARIOS[key]['layers'][PERIOD] = path
+        if args.output:
+            with open(args.output, 'a') as f:
+                f.write(json.dumps(dict(scale=scale, seed=args.seed, districts=polygons, vertices=vertices,
+                                        stages={name: dict(ms=round(elapsed * 1000, 1), peak_mb=round(peak / 2**20, 1))
+                                                for name, (elapsed, peak) in stages.items()})) + '\n')
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+import shapely.ops
+from pyproj import Transformer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geo_utils import transform_to_web_mercator
+
+# Compare the old per-geometry reprojection with the batched one in geo_utils
+# Usage: python benchmarks/bench_reproject.py [path/to/layer.shp] [repeats]
+default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'SSP245&585_shp', 'SSP585_ClimateData_India.shp')
+
+
+# The reprojection try1.py/try2.py used before geo_utils existed
+def transform_per_geometry(gdf):
+    transformer = Transformer.from_crs("epsg:4326", "epsg:3857", always_xy=True)
+    gdf['geometry'] = gdf['geometry'].apply(lambda geom: shapely.ops.transform(transformer.transform, geom))
+    return gdf
+
+
+def best_of(func, gdf, repeats):
+    timings = []
+    for _ in range(repeats):
+        frame = gdf.copy()
+        start = time.perf_counter()
+        result = func(frame)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+if __name__ == '__main__':
+    shapefile_path = sys.argv[1] if len(sys.argv) > 1 else default_path
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    gdf = gpd.read_file(shapefile_path, columns=['State', 'District'])
+    n_vertices = len(shapely.get_coordinates(gdf['geometry'].values))
+    print(f"{os.path.basename(shapefile_path)}: {len(gdf)} features, {n_vertices} vertices")
+
+    old_time, old = best_of(transform_per_geometry, gdf, repeats)
+    new_time, new = best_of(transform_to_web_mercator, gdf, repeats)
+
+    same = shapely.equals_exact(np.asarray(old['geometry'].values), np.asarray(new['geometry'].values), 0).all()
+    print(f"per-geometry transform : {old_time * 1000:8.1f} ms")
+    print(f"batched transform      : {new_time * 1000:8.1f} ms")
+    print(f"speed-up               : {old_time / new_time:8.1f}x")
+    print(f"identical geometry     : {same}")
@@ -0,0 +1,116 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from bokeh.document import Document
+from bokeh.models import ColumnDataSource, Select
+from bokeh.protocol import Protocol
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dataset_registry
+from scenarios import SCENARIOS
+from serve_maps import make_document
+
+# What one serve_maps.py process pays per session: server memory and time to build a
+# session's document, the size of its first load, and the CPU time and message size of
+# each callback, over random user actions. This is what the capacity note in
+# serve_maps.py is based on.
+# Usage: python benchmarks/bench_sessions.py [sessions] [actions per session]
+
+protocol = Protocol()
+
+
+# Bytes a message takes on the websocket: its JSON parts plus binary buffers
+def message_size(message):
+    return (len(message.header_json) + len(message.metadata_json) + len(message.content_json)
+            + sum(len(buffer.data) for buffer in message.buffers))
+
+
+def kb(size):
+    return f"{size / 1024:.1f} KB"
+
+
+if __name__ == '__main__':
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    actions = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    random.seed(0)
+
+    # Arrow allocates outside what tracemalloc sees, so its pool is added in
+    tracemalloc.start()
+    dataset = dataset_registry.districts()
+    for key in SCENARIOS:
+        dataset_registry.scenario(key)
+    shared = tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+    print(f"Shared dataset: {shared / 2**20:.1f} MB ({len(dataset['names'])} districts, {len(SCENARIOS)} scenarios)")
+
+    docs = []
+    for _ in range(sessions):
+        doc = Document()
+        make_document(doc, SCENARIOS)
+        docs.append(doc)
+    per_session = (tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes() - shared) / sessions
+    tracemalloc.stop()
+    # Time it again without tracing, which slows allocation down
+    start = time.perf_counter()
+    for _ in range(sessions):
+        make_document(Document(), SCENARIOS)
+    created = time.perf_counter() - start
+    print(f"Per session: {per_session / 2**20:.2f} MB, {created / sessions * 1000:.1f} ms to build")
+
+    start = time.perf_counter()
+    first_load = message_size(protocol.create('PULL-DOC-REPLY', 'request', docs[0]))
+    print(f"First load: {kb(first_load)}, {(time.perf_counter() - start) * 1000:.1f} ms to serialise")
+
+    # Replay random actions on every session, collecting what each would push to its browser
+    timings = {}
+    for doc in docs:
+        events = []
+        doc.on_change(events.append)
+        widgets = {model.title: model for model in doc.select({'type': Select})}
+        source = next(model for model in doc.select({'type': ColumnDataSource}) if 'xs' in model.data)
+        for _ in range(actions):
+            action = random.choice(['state', 'district', 'parameter', 'tap', 'sort', 'scenario'])
+            if action == 'state':
+                select = widgets["Select State:"]
+                value = random.choice(select.options)
+            elif action == 'district':
+                select = widgets["Select District:"]
+                if not select.options:
+                    continue
+                value = random.choice(select.options)[0]
+            elif action == 'parameter':
+                select = widgets["Select Parameter:"]
+                # 'None' or a (code, display name) pair
+                value = random.choice(select.options)
+                value = value if isinstance(value, str) else value[0]
+            elif action == 'sort':
+                select = widgets["Sort Order:"]
+                value = random.choice(select.options)
+            elif action == 'scenario':
+                select = widgets["Select Scenario:"]
+                value = random.choice(select.options)[0]
+
+            del events[:]
+            start = time.perf_counter()
+            if action == 'tap':
+                source.selected.indices = [random.randrange(len(dataset['names']))]
+            else:
+                select.value = value
+            elapsed = time.perf_counter() - start
+            size = message_size(protocol.create('PATCH-DOC', list(events))) if events else 0
+            timings.setdefault(action, []).append((elapsed, size))
+
+    print(f"{'callback':<10} {'count':>6} {'mean ms':>8} {'max ms':>8} {'mean push':>10} {'max push':>10}")
+    total = []
+    for action, runs in sorted(timings.items()):
+        times = [t for t, _ in runs]
+        sizes = [s for _, s in runs]
+        total += times
+        print(f"{action:<10} {len(runs):>6} {sum(times) / len(times) * 1000:>8.2f} {max(times) * 1000:>8.2f} "
+              f"{kb(sum(sizes) / len(sizes)):>10} {kb(max(sizes)):>10}")
+    mean = sum(total) / len(total)
+    print(f"One process handles ~{1 / mean:.0f} callbacks/s (~{1 / mean:.0f} sessions acting once a second), "
+          f"~{sessions / created:.0f} new sessions/s, and holds ~{2**30 / per_session:.0f} sessions per GB")
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Content-addressed cache for the expensive build stages (read + reproject, simplification,
+# serialisation). An entry is a directory named after the hash of everything its contents
+# depend on: the bytes of the source layer files, the stage parameters (column mapping,
+# precision, ...) and the code that produced it. Changing any input just misses the cache;
+# old entries are removed by evict().
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.build_cache')
+# Eviction limits: total size of all entries, and time since an entry was last used
+MAX_BYTES = 512 * 1024 * 1024
+MAX_AGE = 30 * 24 * 3600
+
+# Files that make up a shapefile layer; whichever of them exist are hashed
+LAYER_EXTENSIONS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+
+# Hash of the source of the given modules, so an entry is rebuilt when the code that
+# produced it changes
+def code_version(*modules):
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# The files of a shapefile layer that exist on disk, given its .shp (or any sibling) path
+def layer_files(path):
+    stem = os.path.splitext(path)[0]
+    return [stem + ext for ext in LAYER_EXTENSIONS if os.path.exists(stem + ext)]
+
+
+# Cache key for `paths` (file contents, read in chunks) plus any JSON-serialisable `parts`
+def cache_key(paths, *parts):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    digest.update(json.dumps(parts, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:32]
+
+
+# Directory of the cache entry for `key`. On a miss `build(directory)` is called to write
+# the entry's files into a scratch directory, which is then renamed into place, so an
+# interrupted build never leaves a half-written entry. Returns (directory, hit).
+def cached(key, build, cache_dir=CACHE_DIR):
+    entry = os.path.join(cache_dir, key)
+    if os.path.isdir(entry):
+        # Mark the entry as recently used for evict()
+        os.utime(entry)
+        return entry, True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+    try:
+        build(scratch)
+        os.replace(scratch, entry)
+    except OSError:
+        # Another build stored the same entry first; its content is identical
+        if not os.path.isdir(entry):
+            raise
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return entry, False
+
+
+def _entry_size(entry):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(entry) for name in names)
+
+
+# Remove entries unused for longer than `max_age` seconds, then the least recently used
+# ones until the cache fits in `max_bytes`. Returns the number of entries removed.
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+    if not os.path.isdir(cache_dir):
+        return 0
+    now = time.time()
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if os.path.isdir(entry):
+            entries.append((os.path.getmtime(entry), _entry_size(entry), entry))
+    entries.sort()
+
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for used, size, entry in entries:
+        if now - used <= max_age and total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,1043 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import nullcontext, redirect_stdout
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import xyzservices
+from bokeh.document import Document
+from bokeh.embed.bundle import bundle_for_objs_and_resources
+from bokeh.embed.elements import html_page_for_render_items
+from bokeh.embed.util import standalone_docs_json_and_render_items
+from bokeh.events import DocumentReady
+from bokeh.layouts import column, row
+from bokeh.models import FixedTicker, TapTool, CustomJS, Select, Div
+from bokeh.models import GeoJSONDataSource, HoverTool, ColumnDataSource, Range1d, ColorBar, LinearColorMapper
+from bokeh.palettes import linear_palette
+from bokeh.plotting import figure
+from bokeh.resources import CDN
+from bokeh.util.browser import view
+
+import build_metrics
+import geo_utils
+from build_cache import CACHE_DIR, cache_key, cached, code_version, evict, layer_files
+from geo_utils import transform_to_web_mercator, to_geojson, to_float32_columns, build_tile_pyramid, read_attribute_columns, WORLD_HALF_WIDTH
+from layer_store import write_layer, read_layer, read_geo_layer
+from map_worker import WORKER_JS, CLIENT_JS
+from payload_report import report_payload
+from scenarios import GEOMETRY_PATH, PERIOD, SCENARIOS, DIFFERENCES, PARAMETERS, parameter_labels, parameter_palettes, difference_palettes
+from scenarios import scenario_description, scenario_entry, scenario_fields, scenario_layer, scenario_parameters
+from stats_utils import compute_stats_table, class_breaks, classify, class_count, CLASS_METHODS
+
+# Single build entry point for every scenario: the district geometry is read, reprojected
+# and serialised once, and each scenario only adds its attribute columns to the page.
+# The loaded, reprojected and serialised layers are kept in an on-disk cache (build_cache.py),
+# so rebuilding after a change to the page itself (palettes, text, callbacks) skips them.
+# Usage: python build_maps.py [--scenarios ssp585 ssp245] [--output climate_map.html] [--show]
+#                             [--cache-dir DIR | --no-cache] [--no-differences]
+
+KEYS = ['State', 'District']
+
+# Bump when the cached load/serialise steps in this file change; together with the source
+# of geo_utils it is part of every cache key
+CACHE_VERSION = 4
+CODE_VERSION = [CACHE_VERSION, code_version(geo_utils)]
+
+
+# Defines update_source(source, data) for the callbacks that refresh the plot sources: when
+# `data` has the same columns and rows as `source`, only the cells that differ are patched
+# (so only those are re-rendered), else the data is replaced
+UPDATE_SOURCE_JS = """
+        function update_source(source, data) {
+            const old = source.data;
+            const columns = Object.keys(data);
+            const n = data[columns[0]].length;
+            if (columns.length !== Object.keys(old).length || !columns.every(c => c in old && old[c].length === n)) {
+                source.data = data;
+                return;
+            }
+            const patches = {};
+            for (const c of columns) {
+                const changed = [];
+                for (let i = 0; i < n; i++) {
+                    if (old[c][i] !== data[c][i]) {
+                        changed.push([i, data[c][i]]);
+                    }
+                }
+                if (changed.length > 0) {
+                    patches[c] = changed;
+                }
+            }
+            if (Object.keys(patches).length > 0) {
+                source.patch(patches);
+            }
+        }
+"""
+
+
+# Defines parameter_label(param): the display name of a parameter code. The page's data is
+# keyed by the codes; label_source is the one table of the names the callbacks show.
+PARAMETER_LABEL_JS = """
+        function parameter_label(param) {
+            const labels = label_source.data;
+            return labels['label'][labels['parameter'].indexOf(param)];
+        }
+"""
+
+
+# Opt-in interaction telemetry (build_maps.py --telemetry): every callback records how long it
+# ran and how long until the browser had painted its result (two animation frames later) in
+# a ring buffer of the last TELEMETRY_SIZE runs, which the ready callback sets up once. In
+# the browser console, map_telemetry.entries() lists them, map_telemetry.export() returns
+# them as JSON with the device's details, and map_telemetry.download() saves that as a file. Work a callback hands
+# to the map worker (sorting, tiles) is not included.
+TELEMETRY_SIZE = 1000
+TELEMETRY_JS = """
+        window.map_telemetry = window.map_telemetry || (() => {
+            const size = %d;
+            const buffer = new Array(size);
+            let next = 0;
+            let count = 0;
+            const entries = () => count < size ? buffer.slice(0, count) : buffer.slice(next).concat(buffer.slice(0, next));
+            const record = (entry) => {
+                buffer[next] = entry;
+                next = (next + 1) %% size;
+                count = Math.min(count + 1, size);
+            };
+            return {
+                entries,
+                clear() {
+                    next = 0;
+                    count = 0;
+                },
+                // A callback that started at `start` has just returned
+                measure(callback, start) {
+                    const end = performance.now();
+                    requestAnimationFrame(() => requestAnimationFrame(() => record({
+                        callback, start: Math.round(start), callback_ms: end - start, render_ms: performance.now() - end,
+                    })));
+                },
+                export() {
+                    return JSON.stringify({
+                        user_agent: navigator.userAgent,
+                        cores: navigator.hardwareConcurrency,
+                        memory_gb: navigator.deviceMemory,
+                        entries: entries(),
+                    });
+                },
+                download(filename = 'map_telemetry.json') {
+                    const link = document.createElement('a');
+                    link.href = URL.createObjectURL(new Blob([this.export()], {type: 'application/json'}));
+                    link.download = filename;
+                    link.click();
+                    URL.revokeObjectURL(link.href);
+                },
+            };
+        })();
+""" % TELEMETRY_SIZE
+
+
+# Code of callback `name`, timed into the page's telemetry when `telemetry` is set. Callbacks
+# that run before the page is ready (and has set up the telemetry) are not recorded.
+def callback_code(name, code, telemetry=False):
+    if not telemetry:
+        return code
+    return f"""
+        const telemetry_start = performance.now();
+        try {{
+{code}
+        }} finally {{
+            if (window.map_telemetry) {{
+                window.map_telemetry.measure({json.dumps(name)}, telemetry_start);
+            }}
+        }}
+        """
+
+
+# Look up / build a cache entry and say which one happened
+def _cached(label, key, build, cache_dir):
+    entry, hit = cached(key, build, cache_dir)
+    build_metrics.note(cache='hit' if hit else 'built', key=key[:8])
+    print(f"{label}: {'cache hit' if hit else 'built'} ({key[:8]})")
+    return entry
+
+
+# Load the shared district boundaries (names + geometry) in Web Mercator, from the cache
+# entry's memory-mapped districts.arrow (see layer_store.py; memory_map=False reads it into
+# memory, for caches deleted while the layer is in use). The cache key is kept in `attrs`
+# so the stages derived from this layer can key on it without rehashing.
+def load_districts(path=GEOMETRY_PATH, cache_dir=CACHE_DIR, memory_map=True):
+    def build(directory):
+        with build_metrics.stage('read'):
+            gdf = gpd.read_file(path, columns=KEYS, engine='pyogrio', use_arrow=True)
+            # Names repeat across rows (states always, districts in finer layers): keep them as
+            # categoricals, so grouping works on integer codes and the codes can go to the page
+            gdf[KEYS] = gdf[KEYS].astype('category')
+        with build_metrics.stage('reproject'):
+            gdf = transform_to_web_mercator(gdf)
+        write_layer(gdf, os.path.join(directory, 'districts.arrow'))
+
+    key = cache_key(layer_files(path), 'districts', KEYS, CODE_VERSION)
+    entry = _cached("District geometry", key, build, cache_dir)
+    districts = read_geo_layer(os.path.join(entry, 'districts.arrow'), memory_map)
+    districts.attrs['cache_key'] = key
+    return districts
+
+
+# Cache entry (attributes.arrow) of one scenario's parameters for a projection period,
+# read from its DBF, renamed to their codes (scenarios.PARAMETERS) and lined up with the
+# rows of `districts` by State + District. Only the registered fields are read, already as
+# their registered dtype, so there is nothing left to convert. difference=True reads the
+# fields difference layers subtract instead (see scenarios.PARAMETERS).
+def scenario_attributes_entry(key, districts, cache_dir=CACHE_DIR, period=PERIOD, difference=False):
+    fields = scenario_fields(key, difference)
+    dtypes = {field: PARAMETERS[code]['dtype'] for field, code in fields.items()}
+    path = scenario_layer(key, period)
+
+    def build(directory):
+        attributes = read_attribute_columns(path, KEYS + list(fields), dtypes)
+        attributes = attributes.rename(columns=fields)
+        attributes = attributes.set_index(KEYS).reindex(pd.MultiIndex.from_frame(districts[KEYS]))
+        # Districts missing from this scenario's table get 0, like missing values
+        write_layer(attributes.fillna(0).reset_index(), os.path.join(directory, 'attributes.arrow'))
+
+    cache = cache_key(layer_files(path), 'attributes', fields, dtypes, districts.attrs['cache_key'], CODE_VERSION)
+    return _cached(f"{key} {period} attributes", cache, build, cache_dir)
+
+
+# Load one scenario's parameters (see scenario_attributes_entry); the parameter columns are
+# read-only views of the memory-mapped file (of a copy in memory with memory_map=False)
+def load_scenario_attributes(key, districts, cache_dir=CACHE_DIR, period=PERIOD, memory_map=True, difference=False):
+    entry = scenario_attributes_entry(key, districts, cache_dir, period, difference)
+    return read_layer(os.path.join(entry, 'attributes.arrow'), memory_map=memory_map)
+
+
+# Parameters of a difference layer (see scenarios.DIFFERENCES): its scenarios' parameters
+# are loaded from the fields a difference subtracts, so both sides are the same quantity,
+# the two tables are joined on State + District and every parameter both have is
+# subtracted, column by column. Rows come out in the order of the first scenario's.
+def difference_attributes(key, districts, cache_dir=CACHE_DIR, period=PERIOD, memory_map=True):
+    first, second = (load_scenario_attributes(k, districts, cache_dir, period, memory_map, difference=True).set_index(KEYS)
+                     for k in DIFFERENCES[key]['scenarios'])
+    parameters = scenario_parameters(key)
+    difference = first[parameters] - second[parameters].reindex(first.index)
+    return difference.reset_index()
+
+
+# Number of colour classes of each classification when none is given: the full palette for
+# linear scales, a few readable classes otherwise
+DEFAULT_CLASSES = dict(linear=256, quantile=7, jenks=7)
+
+
+# Colour scale of every parameter, classified by `method` into `n_classes` classes (see
+# stats_utils.class_breaks): {param: dict(classes=class of every district as uint8,
+# palette=colour of every class, ticks=colour bar positions on the class scale, labels=the
+# values there)}. The map colours a district by looking its class up in the palette, with
+# no range to scan when the parameter changes. `centred` scales (for diverging palettes)
+# are symmetric around 0, so no difference falls in the middle of the palette.
+def colour_scales(attributes, parameters, method='linear', n_classes=None, palettes=parameter_palettes, centred=False):
+    n_classes = n_classes or DEFAULT_CLASSES[method]
+    scales = {}
+    for param in parameters:
+        values = np.asarray(attributes[param], dtype=float)
+        # The breaks of the values together with their negatives are symmetric
+        breaks = class_breaks(np.concatenate([values, -values]) if centred else values, n_classes, method)
+        count = len(breaks) - 1
+        ticks = np.unique(np.linspace(0, count, min(count, 10) + 1).round().astype(int))
+        scales[param] = dict(
+            classes=classify(values, breaks),
+            palette=linear_palette(palettes[param], count),
+            ticks=ticks.tolist(),
+            labels=[f"{breaks[t]:.2f}" for t in ticks],
+        )
+    return scales
+
+
+# Simplify the district boundaries for every zoom level, into a cache entry holding the
+# coarsest level (coarse.geojson) and the tile pyramid of the finer ones (tiles/, tiles.json)
+def district_layer_entry(districts, cache_dir=CACHE_DIR, levels=3, plot_width=900, precision=2):
+    def build(directory):
+        # Simplifying the levels and writing the finer ones as tiles
+        with build_metrics.stage('tiles'):
+            coarse_geoms, tile_index = build_tile_pyramid(districts, os.path.join(directory, 'tiles'), plot_width=plot_width,
+                                                          levels=levels, precision=precision)
+        # Convert the geometry and district names to GeoJSON format in a single pass; the state
+        # goes as its category code, which the page expands back to names when it loads
+        with build_metrics.stage('geojson'):
+            layer = gpd.GeoDataFrame(dict(District=districts['District'], state_code=districts['State'].cat.codes),
+                                     geometry=coarse_geoms, crs=districts.crs)
+            with open(os.path.join(directory, 'coarse.geojson'), 'w') as f:
+                to_geojson(layer, precision=precision, out=f)
+        with open(os.path.join(directory, 'tiles.json'), 'w') as f:
+            json.dump(tile_index, f)
+
+    key = cache_key([], 'district layer', districts.attrs['cache_key'], levels, plot_width, precision, CODE_VERSION)
+    return _cached("District layer", key, build, cache_dir)
+
+
+# The district layer of a page: returns the coarsest level as GeoJSON to embed in the page,
+# and the tile pyramid of the finer levels, published next to the page as
+# `<basename>_tiles/<z>/<x>/<y>.json`, for it to fetch the tiles in view.
+def build_district_layer(districts, basename, cache_dir=CACHE_DIR, levels=3, plot_width=900, precision=2):
+    entry = district_layer_entry(districts, cache_dir, levels, plot_width, precision)
+
+    # Hard-link the tiles out of the cache where the filesystem allows it, else copy them
+    def link(src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    tiles_dir = f"{basename}_tiles"
+    shutil.rmtree(tiles_dir, ignore_errors=True)
+    shutil.copytree(os.path.join(entry, 'tiles'), tiles_dir, copy_function=link)
+
+    with open(os.path.join(entry, 'tiles.json')) as f:
+        tile_index = json.load(f)
+    with open(os.path.join(entry, 'coarse.geojson')) as f:
+        return f.read(), os.path.basename(tiles_dir), tile_index
+
+
+# Run `load()` as a build stage and print its wall time and the peak resident memory of the
+# process while it ran (GDAL and Arrow allocations included; see build_metrics.peak_rss)
+def measured(label, load):
+    with build_metrics.stage(label):
+        start = time.perf_counter()
+        result, peak = build_metrics.peak_rss(load)
+        elapsed = time.perf_counter() - start
+    print(f"Loaded {label}: {elapsed * 1000:.0f} ms, peak RSS {peak / 2**20:.1f} MB")
+    return result
+
+
+# Map figure over `bounds` (Web Mercator) with the background tiles
+def map_figure(bounds):
+    # Create the figure
+    p = figure(
+        title="Climate Map",
+        x_axis_type="mercator",
+        y_axis_type="mercator",
+        tools="pan,wheel_zoom,zoom_in,zoom_out,reset",
+        width=900,
+        height=800
+    )
+
+    # Add tile provider (map background)
+    xyz_provider = xyzservices.TileProvider(name="Google Maps",
+                                            url=" https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}",
+                                            attribution="(C) xyzservices",
+                                            )
+    p.add_tile(xyz_provider, alpha=0.5)
+
+    # Set initial map bounds to prevent resizing on selection
+    p.x_range = Range1d(start=bounds[0], end=bounds[2])
+    p.y_range = Range1d(start=bounds[1], end=bounds[3])
+    return p
+
+
+# District patches on the map, coloured through a colour mapper the parameter callbacks
+# reconfigure, with their hover tool and (hidden) colour bar
+def district_glyphs(p, source):
+    # The colour mapper is reconfigured by the parameter callback. It maps a district's colour
+    # class straight to its palette entry: class i of n falls in [i, i + 1) of [0, n).
+    palette = parameter_palettes['rf_annual']
+    color_mapper = LinearColorMapper(palette=palette, low=0, high=len(palette))
+    initial_fill_color = "#FFFF9E"
+    # Add patches (polygons) to the figure
+    patches = p.patches(
+        'xs', 'ys',
+        source=source,
+        fill_color=initial_fill_color,
+        line_color="black",
+        line_width=0.5,
+        fill_alpha=0.7,
+        name="patches"
+    )
+
+    # Add hover tool
+    hover = HoverTool()
+    hover.tooltips = [("State", "@State"), ("District", "@District")]
+    p.add_tools(hover)
+
+    # Create a color bar for the selected parameter: it runs over the classes, with ticks at
+    # class edges labelled by their values
+    color_bar = ColorBar(
+        color_mapper=color_mapper,
+        ticker=FixedTicker(ticks=[]),
+        label_standoff=12,
+        border_line_color=None,
+        location=(0, 0),
+        visible=False
+    )
+    p.add_layout(color_bar, 'left')
+    return color_mapper, patches, hover, color_bar
+
+
+# The boxplot (of a state's or India's values) and the bar plot (one bar per district)
+def side_plots(box_color):
+    # Empty initial boxplot data
+    initial_boxplot_data = dict(q1=[], q2=[], q3=[], upper=[], lower=[])
+    boxplot_source = ColumnDataSource(data=initial_boxplot_data)
+
+    # Create the initial boxplot
+    p_box = figure(title="Boxplot", width=800, height=400)
+    # Whiskers
+    p_box.segment(0, 'upper', 0, 'q3', source=boxplot_source, line_color="black")
+    p_box.segment(0, 'lower', 0, 'q1', source=boxplot_source, line_color="black")
+    # Boxes, coloured per scenario
+    boxes = [
+        p_box.vbar(x=0, width=0.7, bottom='q2', top='q3', source=boxplot_source, fill_color=box_color, line_color="black"),
+        p_box.vbar(x=0, width=0.7, bottom='q1', top='q2', source=boxplot_source, fill_color=box_color, line_color="black"),
+    ]
+    # Whisker caps
+    p_box.rect(0, 'upper', 0.2, 0.001, source=boxplot_source, line_color="black")
+    p_box.rect(0, 'lower', 0.2, 0.001, source=boxplot_source, line_color="black")
+    p_box.xgrid.grid_line_color = None
+    p_box.xaxis.major_label_orientation = 3.14 / 2
+    p_box.xaxis.major_label_text_font_size = '0pt'  # Remove x-axis tick labels
+    p_box.xaxis.major_tick_line_color = None  # Remove x-axis ticks
+    p_box.xaxis.minor_tick_line_color = None
+
+    # Create a ColumnDataSource for the bar plot
+    bar_source = ColumnDataSource(data=dict(districts=[], values=[], colors=[]))
+    # Create the bar plot
+    p_bar = figure(x_range=[], title="Bar Plot", width=800, height=400)
+    p_bar.vbar(x='districts', top='values', width=0.9, color='colors', source=bar_source)
+    p_bar.xgrid.grid_line_color = None
+    p_bar.xaxis.major_label_orientation = 3.14 / 2  # Rotate x-axis labels vertically
+
+    # configure the tooltip
+    hover_two = HoverTool(tooltips=[("Value", "@values")])
+    p_bar.add_tools(hover_two)
+    return p_box, boxplot_source, boxes, p_bar, bar_source
+
+
+# Dropdowns for the scenario, parameter, state, district and sort order
+def control_widgets(scenario_keys, states, period=PERIOD):
+    select_styles = {'background-color': '#4682B4', 'color': 'white', 'font-family': 'Arial, sans-serif', 'font-size': '14px'}
+
+    # Create a Select widget for scenarios and one for parameters
+    first = scenario_entry(scenario_keys[0])
+    scenario_select = Select(title="Select Scenario:", value=scenario_keys[0],
+                             options=[(key, scenario_entry(key)['title']) for key in scenario_keys], styles=select_styles)
+    # The parameter options are (code, display name) pairs
+    parameter_select = Select(title="Select Parameter:", value=first['initial_param'] or 'None',
+                              options=['None'] + [(param, parameter_labels[param]) for param in scenario_parameters(scenario_keys[0])],
+                              styles=select_styles)
+
+    description_div = Div(
+        text=scenario_description(scenario_keys[0], period),
+        width=800,
+        height=80  # Adjust the height to fit both lines
+    )
+
+    # Create Select widgets
+    state_options = ['India'] + states
+    state_select = Select(title="Select State:", value='India', options=state_options, styles=select_styles)
+    district_select = Select(title="Select District:", options=[], styles=select_styles)
+
+    # Create a Select widget for sorting options
+    sort_select = Select(title="Sort Order:", value=" ", options=["Ascending", "Descending"])
+    return scenario_select, parameter_select, description_div, state_select, district_select, sort_select
+
+
+# Build the map page's document for the given scenarios and difference layers (the first one
+# is shown when the page opens); its tiles are published as `<basename>_tiles/`
+def build_document(districts, scenario_attributes, basename, cache_dir=CACHE_DIR, classification='linear', n_classes=None,
+                   telemetry=False, period=PERIOD):
+    scenario_keys = list(scenario_attributes)
+    first = scenario_entry(scenario_keys[0])
+
+    # The page embeds the coarsest level of detail and fetches the tiles in view of finer ones
+    # as the map is zoomed in
+    with build_metrics.stage('district layer'):
+        geojson, tiles_url, tile_index = build_district_layer(districts, basename, cache_dir)
+        build_metrics.note(geojson_kb=round(len(geojson) / 1024, 1), tiles=sum(len(keys) for keys in tile_index.values()))
+    geo_source = GeoJSONDataSource(geojson=geojson)
+
+    # Each scenario's parameters travel as packed float32 columns (binary, not JSON numbers),
+    # together with their colour classes (uint8 columns), boxplot statistics and dropdown
+    # entries. Every distinct class palette is sent once; a scale names its palette by row.
+    # Difference layers are coloured by diverging palettes, centred on no difference. The data
+    # is keyed by the parameter codes; their display names and units are sent once, in
+    # label_source.
+    attribute_sources = {}
+    class_sources = {}
+    colour_sources = {}
+    palettes = {}
+    stats_sources = {}
+    scenario_info = {}
+    for key, attributes in scenario_attributes.items():
+        scenario = scenario_entry(key)
+        parameters = scenario_parameters(key)
+        attribute_sources[key] = ColumnDataSource(data=to_float32_columns(attributes, parameters))
+        if key in DIFFERENCES:
+            scales = colour_scales(attributes, parameters, classification, n_classes, difference_palettes, centred=True)
+        else:
+            scales = colour_scales(attributes, parameters, classification, n_classes)
+        class_sources[key] = ColumnDataSource(data={param: scales[param]['classes'] for param in parameters})
+        colour_sources[key] = ColumnDataSource(data=dict(
+            parameter=parameters,
+            palette=[palettes.setdefault(tuple(scales[param]['palette']), len(palettes)) for param in parameters],
+            ticks=[scales[param]['ticks'] for param in parameters],
+            labels=[scales[param]['labels'] for param in parameters],
+        ))
+        # Boxplot statistics as a model, so every callback references one copy: one row per
+        # group (state, then India), one [q1, q2, q3, lower, upper, min, max] cell per parameter
+        stats_table = compute_stats_table(attributes, parameters)
+        groups = list(stats_table[parameters[0]])
+        stats_data = {param: [stats_table[param][g] for g in groups] for param in parameters}
+        stats_sources[key] = ColumnDataSource(data=dict(group=groups, **stats_data))
+        scenario_info[key] = dict(
+            description=scenario_description(key, period),
+            parameters=parameters,
+            box_color=scenario['box_color'],
+            initial_param=scenario['initial_param'] or 'None',
+        )
+    palette_source = ColumnDataSource(data=dict(palette=[list(palette) for palette in palettes]))
+    # Display name and units of every parameter on the page, the only copy of them
+    shown = [param for param in PARAMETERS if any(param in info['parameters'] for info in scenario_info.values())]
+    label_source = ColumnDataSource(data=dict(
+        parameter=shown,
+        label=[parameter_labels[param] for param in shown],
+        units=[PARAMETERS[param]['units'] for param in shown],
+    ))
+
+    # Create the map figure
+    p = map_figure(districts.total_bounds)
+
+    # Show the districts in view at the tile zoom that matches the screen resolution, and the
+    # embedded coarse geometry when zoomed out further than the first tile zoom
+    lod_callback = CustomJS(
+        args=dict(geo_source=geo_source, x_range=p.x_range, y_range=p.y_range, tiles_url=tiles_url, tile_index=tile_index,
+                  plot_width=p.width, tile_pixels=256, world_half_width=WORLD_HALF_WIDTH),
+        code="""
+        // Tiles are loaded by the map worker, which starts when the page is ready
+        const worker = geo_source._worker;
+        if (!worker) {
+            return;
+        }
+        const tiles = geo_source._tiles || (geo_source._tiles = {
+            coarse: {xs: geo_source.data['xs'], ys: geo_source.data['ys']},
+            zooms: Object.keys(tile_index).map(Number).sort((a, b) => a - b),
+            keys: {},
+            cache: new Map(),
+            wanted: '',
+            timer: null,
+        });
+        // A zoom or pan changes up to four range ends; look at the view once they have all
+        // settled, and not on every step of a continuous wheel zoom
+        clearTimeout(tiles.timer);
+        tiles.timer = setTimeout(update, 50);
+
+        function update() {
+            const world = 2 * world_half_width;
+            const pixel = (x_range.end - x_range.start) / plot_width;
+            const z = Math.min(Math.ceil(Math.log2(world / (tile_pixels * pixel))), tiles.zooms[tiles.zooms.length - 1]);
+            const wanted = [];
+            if (z >= tiles.zooms[0]) {
+                const size = world / 2 ** z;
+                const keys = tiles.keys[z] || (tiles.keys[z] = new Set(tile_index[z]));
+                const x0 = Math.floor((x_range.start + world_half_width) / size);
+                const x1 = Math.floor((x_range.end + world_half_width) / size);
+                const y0 = Math.floor((world_half_width - y_range.end) / size);
+                const y1 = Math.floor((world_half_width - y_range.start) / size);
+                for (let x = x0; x <= x1; x++) {
+                    for (let y = y0; y <= y1; y++) {
+                        if (keys.has(`${x}/${y}`)) {
+                            wanted.push(`${z}/${x}/${y}`);
+                        }
+                    }
+                }
+            }
+            const view = wanted.join(',');
+            if (view === tiles.wanted) {
+                return;
+            }
+            tiles.wanted = view;
+
+            // Fetching, parsing and converting a tile happens off the UI thread; the worker's URL
+            // is a blob, so it gets the tile's absolute URL. Recently used tiles stay cached.
+            const requests = wanted.map(key => {
+                if (!tiles.cache.has(key)) {
+                    const url = new URL(`${tiles_url}/${key}.json`, document.baseURI).href;
+                    const request = worker.request({op: 'patches', url: url});
+                    request.catch(() => tiles.cache.delete(key));
+                    tiles.cache.set(key, request);
+                }
+                const request = tiles.cache.get(key);
+                tiles.cache.delete(key);
+                tiles.cache.set(key, request);
+                return request;
+            });
+            while (tiles.cache.size > 512) {
+                tiles.cache.delete(tiles.cache.keys().next().value);
+            }
+
+            Promise.all(requests)
+                .then(loaded => {
+                    // Ignore tiles that arrive after the user has moved elsewhere
+                    if (tiles.wanted !== view) {
+                        return;
+                    }
+                    // Every district in view gets its finer geometry, the rest keep the coarse one
+                    const xs = tiles.coarse.xs.slice();
+                    const ys = tiles.coarse.ys.slice();
+                    for (const tile of loaded) {
+                        for (let k = 0; k < tile.rows.length; k++) {
+                            xs[tile.rows[k]] = tile.xs[k];
+                            ys[tile.rows[k]] = tile.ys[k];
+                        }
+                    }
+                    geo_source.data = Object.assign({}, geo_source.data, {xs: xs, ys: ys});
+                })
+                .catch(() => {
+                    // Tiles are unavailable (e.g. page opened from disk); keep the current geometry
+                    // and try again on the next move
+                    tiles.wanted = null;
+                });
+        }
+        """
+    )
+    for axis_range in (p.x_range, p.y_range):
+        axis_range.js_on_change('start', lod_callback)
+        axis_range.js_on_change('end', lod_callback)
+
+    color_mapper, patches, hover, color_bar = district_glyphs(p, geo_source)
+
+    p_box, boxplot_source, boxes, p_bar, bar_source = side_plots(first['box_color'])
+
+    # Rows of every state from one groupby pass over the State codes, listed in category order
+    # so a district's state_code indexes the names directly. The callbacks look selections up
+    # here instead of scanning the State column; it is a model since several callbacks share it.
+    states = districts['State'].cat.categories.tolist()
+    state_indices = districts.groupby('State', observed=True).indices
+    state_rows_source = ColumnDataSource(data=dict(state=states, rows=[state_indices[state].astype('int32') for state in states]))
+
+    scenario_select, parameter_select, description_div, state_select, district_select, sort_select = \
+        control_widgets(scenario_keys, states, period)
+
+    # Add a callback to highlight the selected state
+    state_select_callback = CustomJS(
+        args=dict(source=geo_source, state_select=state_select, district_select=district_select, state_rows_source=state_rows_source, boxplot_source=boxplot_source, bar_source=bar_source, parameter_select=parameter_select, p_box=p_box, p_bar=p_bar, patches=patches, sort_select=sort_select,
+                  scenario_select=scenario_select, stats_sources=stats_sources, attribute_sources=attribute_sources,
+                  label_source=label_source),
+        code=UPDATE_SOURCE_JS + PARAMETER_LABEL_JS + """
+        // Highlight the selected state
+        var data = source.data;
+        var state = state_select.value;
+        const selected_param = parameter_select.value;
+        const stats = stats_sources[scenario_select.value].data;
+        const attributes = attribute_sources[scenario_select.value].data;
+
+        const state_rows = state_rows_source.data;
+        const k = state_rows['state'].indexOf(state);
+        const rows = k >= 0 ? Array.from(state_rows['rows'][k]) : [];
+        // Only the selection changes; the map's data is not sent again
+        source.selected.indices = rows;
+
+        // Update district dropdown options
+        // Each option's value is the district's row, so district names that repeat across
+        // states never need to be looked up
+        district_select.options = rows.map(i => [String(i), data['District'][i]]);
+        district_select.value = '';
+
+        if (!(selected_param in stats)) {
+            return;
+        }
+
+        // Boxplot values are precomputed per state (and for India) at build time
+        const [q1, q2, q3, lower, upper, min_value, max_value] = stats[selected_param][stats['group'].indexOf(state)];
+        update_source(boxplot_source, {q1: [q1], q2: [q2], q3: [q3], upper: [upper], lower: [lower]});
+        p_box.y_range.start = lower;
+        p_box.y_range.end = upper;
+        p_box.title.text = parameter_label(selected_param);
+
+        if (state == 'India') {
+
+            // Empty the bar plot
+            update_source(bar_source, {districts: [], values: [], colors: []});
+            p_bar.x_range.factors = [];
+            p_bar.title.text = `No data for bar plot in ${state}`;
+            p_bar.y_range.start = 0;
+            p_bar.y_range.end = 1;
+
+        } else {
+            // Update bar plot data for selected parameter for all districts in the state
+            const districts = [];
+            const district_values = [];
+            const colors = [];
+            for (const i of rows) {
+                districts.push(data['District'][i]);
+                district_values.push(attributes[selected_param][i]);
+                colors.push('#006ca5');
+            }
+
+            update_source(bar_source, {districts: districts, values: district_values, colors: colors});
+            p_bar.x_range.factors = districts;
+            p_bar.title.text = `${parameter_label(selected_param)} in ${state}`;
+
+            // Set the y-axis range to span from the minimum to the maximum value
+            p_bar.y_range.start = min_value;
+            p_bar.y_range.end = max_value;
+        }
+        """
+    )
+    state_select.js_on_change('value', state_select_callback)
+
+    # Callback for district select dropdown
+    district_select_callback = CustomJS(
+        args=dict(source=geo_source, district_select=district_select, parameter_select=parameter_select, bar_source=bar_source, p_bar=p_bar,
+                  scenario_select=scenario_select, attribute_sources=attribute_sources, label_source=label_source),
+        code=UPDATE_SOURCE_JS + PARAMETER_LABEL_JS + """
+        if (district_select.value === '') {
+            // The state callback clears the district; keep the state's selection and plots
+            return;
+        }
+        // The option value is the district's row
+        const selected_index = Number(district_select.value);
+        const selected_district = source.data['District'][selected_index];
+        const selected_param = parameter_select.value;
+        const param_values = attribute_sources[scenario_select.value].data[selected_param] || [];
+        const selected_value = param_values[selected_index];
+
+        source.selected.indices = [selected_index];
+
+        // Update bar plot data
+        update_source(bar_source, {
+            districts: [selected_district],
+            values: [selected_value],
+            colors: ['#dc6601']  // Highlight color for selected district
+        });
+        p_bar.x_range.factors = [selected_district];
+        p_bar.title.text = `${parameter_label(selected_param)} in ${selected_district}`;
+        p_bar.y_range.start = Math.min(0, selected_value);  // Adjust y-axis range if necessary
+        """
+    )
+    district_select.js_on_change('value', district_select_callback)
+
+    callback = CustomJS(
+        args=dict(
+            geo_source=geo_source,
+            color_mapper=color_mapper,
+            patches=patches,
+            color_bar=color_bar,
+            hover=hover,
+            parameter_select=parameter_select,
+            state_select=state_select,
+            scenario_select=scenario_select,
+            attribute_sources=attribute_sources,
+            colour_sources=colour_sources,
+            palette_source=palette_source,
+            label_source=label_source,
+            stats_sources=stats_sources,
+            boxplot_source=boxplot_source,
+            p_box=p_box,
+            p_bar=p_bar,
+            bar_source=bar_source,
+            state_rows_source=state_rows_source
+        ),
+        code=UPDATE_SOURCE_JS + PARAMETER_LABEL_JS + """
+        const selected_param = parameter_select.value;
+        const state = state_select.value;
+        const stats = stats_sources[scenario_select.value].data;
+        const attributes = attribute_sources[scenario_select.value].data;
+
+        if (!(selected_param in stats)) {
+            patches.glyph.fill_color = "#FFFF9E";  // Set to initial fill color
+            color_bar.visible = false;
+            p_box.visible = false;
+            p_bar.visible = false;
+            return;
+        }
+        p_box.visible = true;
+        p_bar.visible = true;
+
+        // Every scenario's parameters and their colour classes are columns of the map (added
+        // when the page loads), so switching only points the fill colour and the hover tool at
+        // other columns
+        const field = `${scenario_select.value}/${selected_param}`;
+
+        // The classes were computed at build time: colouring looks each district's class up in
+        // the scale's palette, and the colour bar shows the class edges
+        const colours = colour_sources[scenario_select.value].data;
+        const scale = colours['parameter'].indexOf(selected_param);
+        const palette = palette_source.data['palette'][colours['palette'][scale]];
+        color_mapper.palette = palette;
+        color_mapper.high = palette.length;
+        patches.glyph.fill_color = { field: `${field}/class`, transform: color_mapper };
+        color_bar.ticker.ticks = colours['ticks'][scale];
+        color_bar.major_label_overrides = new Map(colours['ticks'][scale].map((tick, i) => [tick, colours['labels'][scale][i]]));
+        color_bar.title = label_source.data['units'][label_source.data['parameter'].indexOf(selected_param)];
+        color_bar.visible = true;
+
+        // Update hover tool
+        hover.tooltips = [
+           ["State", "@State"],
+           ["District", "@District"],
+           [parameter_label(selected_param), `@{${field}}`]
+        ];
+        hover.change.emit();
+
+        const selected = geo_source.selected.indices;
+
+        // Boxplot values are precomputed per state (and for India) at build time
+        const row_state = state == 'India' ? 'India' : (geo_source.data['State'][selected[0]] || state);
+        const [q1, q2, q3, lower, upper, min_value, max_value] = stats[selected_param][stats['group'].indexOf(row_state)];
+        update_source(boxplot_source, {q1: [q1], q2: [q2], q3: [q3], upper: [upper], lower: [lower]});
+        p_box.y_range.start = lower;
+        p_box.y_range.end = upper;
+        p_box.title.text = parameter_label(selected_param);
+
+        if (state != 'India') {
+            const state = row_state;
+
+            // Update bar plot data for selected parameter for all districts in the state
+            const districts = [];
+            const district_values = [];
+            const colors = [];
+            const state_rows = state_rows_source.data;
+            for (const i of state_rows['rows'][state_rows['state'].indexOf(state)] || []) {
+                districts.push(geo_source.data['District'][i]);
+                district_values.push(attributes[selected_param][i]);
+                colors.push('#006ca5');
+            }
+
+            update_source(bar_source, {districts: districts, values: district_values, colors: colors});
+            p_bar.x_range.factors = districts;
+            p_bar.title.text = `${parameter_label(selected_param)} in ${state}`;
+
+            // Set the y-axis range to span from the minimum to the maximum value
+            p_bar.y_range.start = min_value;
+            p_bar.y_range.end = max_value;
+        }
+        """
+    )
+    parameter_select.js_on_change('value', callback)
+
+    tap_callback = CustomJS(
+        args=dict(source=geo_source, boxplot_source=boxplot_source, bar_source=bar_source, parameter_select=parameter_select, p_box=p_box,
+                  p_bar=p_bar, patches=patches, district_select=district_select, state_select=state_select,
+                  scenario_select=scenario_select, stats_sources=stats_sources, attribute_sources=attribute_sources,
+                  state_rows_source=state_rows_source, label_source=label_source),
+        code=UPDATE_SOURCE_JS + PARAMETER_LABEL_JS + """
+        source.selected.indices = [source.selected.indices.pop()];
+
+        const selected_param = parameter_select.value
+        const stats = stats_sources[scenario_select.value].data;
+        const attributes = attribute_sources[scenario_select.value].data;
+        if(source.selected.indices.length > 0 && selected_param in stats) {
+            const state = source.data['State'][source.selected.indices]
+
+            //Update boxplot for selected parameter and state from the precomputed table
+            const [q1, q2, q3, lower, upper, min_value, max_value] = stats[selected_param][stats['group'].indexOf(state)];
+            update_source(boxplot_source, {q1: [q1], q2: [q2], q3: [q3], upper: [upper], lower: [lower]});
+            p_box.y_range.start = lower
+            p_box.y_range.end = upper
+            p_box.title.text = `${parameter_label(selected_param)} in ${state}`;
+
+            // Update bar plot data for selected parameter for all districts in the state
+            const districts = [];
+            const district_values = [];
+            const colors = [];
+            const selected_row = source.selected.indices[0];
+            const state_rows = state_rows_source.data;
+            for (const i of state_rows['rows'][state_rows['state'].indexOf(state)]) {
+                districts.push(source.data['District'][i]);
+                district_values.push(attributes[selected_param][i]);
+                if (i === selected_row) {
+                    colors.push('#dc6601');
+                } else {
+                    colors.push('#006ca5');
+                }
+            }
+            update_source(bar_source, {districts: districts, values: district_values, colors: colors});
+            p_bar.x_range.factors = districts;
+            p_bar.title.text = `${parameter_label(selected_param)} in ${state}`;
+
+            // Set the y-axis range to span from the minimum to the maximum value
+            p_bar.y_range.start = min_value;
+            p_bar.y_range.end = max_value;
+        }
+        """
+    )
+    tap = TapTool()
+    tap.callback = tap_callback
+    p.add_tools(tap)
+
+    # Callback to update the bar plot based on the selected sort order
+    sort_callback = CustomJS(args=dict(bar_source=bar_source, p_bar=p_bar, geo_source=geo_source), code=UPDATE_SOURCE_JS + """
+        const sort_order = this.value;
+        const data = bar_source.data;
+        if (!geo_source._worker || data['values'].length == 0) {
+            return;
+        }
+        // The map worker ranks the bars; drop the answer if the bars changed meanwhile (they
+        // are patched in place, so compare their content)
+        const bars = () => JSON.stringify([Array.from(data['districts']), Array.from(data['values'])]);
+        const ranked = bars();
+        geo_source._worker.request({op: 'rank', values: Array.from(data['values']), descending: sort_order === "Descending"})
+            .then(order => {
+                if (bar_source.data !== data || bars() !== ranked) {
+                    return;
+                }
+                const sorted = {};
+                for (const column of ['districts', 'values', 'colors']) {
+                    sorted[column] = Array.from(order, i => data[column][i]);
+                }
+                update_source(bar_source, sorted);
+                p_bar.x_range.factors = sorted['districts'];
+            });
+    """)
+    sort_select.js_on_change('value', sort_callback)
+
+    # Switching scenario swaps the heading, the parameter list and the box colour, then
+    # recolours the map from the new scenario's columns
+    scenario_callback = CustomJS(
+        args=dict(scenario_select=scenario_select, scenario_info=scenario_info, description_div=description_div,
+                  parameter_select=parameter_select, boxes=boxes, parameter_callback=callback, label_source=label_source),
+        code=PARAMETER_LABEL_JS + """
+        const info = scenario_info[scenario_select.value];
+        description_div.text = info.description;
+        for (const box of boxes) {
+            box.glyph.fill_color = info.box_color;
+        }
+
+        const current = parameter_select.value;
+        parameter_select.options = ['None'].concat(info.parameters.map(param => [param, parameter_label(param)]));
+        const next = current !== 'None' && info.parameters.includes(current) ? current : info.initial_param;
+        if (next === current) {
+            parameter_callback.execute(parameter_select);
+        } else {
+            parameter_select.value = next;
+        }
+        """
+    )
+    scenario_select.js_on_change('value', scenario_callback)
+
+    layout = column(row(description_div, scenario_select, state_select, district_select, parameter_select), row(p, sort_select, column(p_bar, p_box)))
+
+    doc = Document()
+    doc.add_root(layout)
+    # When the page has loaded, open the scenario named in the URL (climate_map.html#ssp245),
+    # else colour the first one by its initial parameter, if it has one
+    ready_callback = CustomJS(args=dict(scenario_select=scenario_select, parameter_select=parameter_select, parameter_callback=callback,
+                                        geo_source=geo_source, state_rows_source=state_rows_source, attribute_sources=attribute_sources,
+                                        class_sources=class_sources,
+                                        worker_source=WORKER_JS, host=geo_source), code=CLIENT_JS + """
+        // Expand the state codes shipped with the map into the State names the hover tool and
+        // the callbacks use, and add every scenario's parameters as '<scenario>/<parameter>'
+        // columns and their colour classes as '<scenario>/<parameter>/class' columns (the same
+        // arrays, not copies) for the parameter callback to colour by
+        const states = state_rows_source.data['state'];
+        const columns = {State: Array.from(geo_source.data['state_code'], code => states[code])};
+        for (const [key, source] of Object.entries(attribute_sources)) {
+            for (const [param, values] of Object.entries(source.data)) {
+                columns[`${key}/${param}`] = values;
+                columns[`${key}/${param}/class`] = class_sources[key].data[param];
+            }
+        }
+        geo_source.data = Object.assign({}, geo_source.data, columns);
+
+        const requested = window.location.hash.slice(1);
+        if (requested && requested !== scenario_select.value && scenario_select.options.some(o => o[0] === requested)) {
+            scenario_select.value = requested;
+        } else if (parameter_select.value !== 'None') {
+            parameter_callback.execute(parameter_select);
+        }
+    """)
+    doc.js_on_event(DocumentReady, ready_callback)
+
+    callbacks = dict(ready=ready_callback, lod=lod_callback, state=state_select_callback, district=district_select_callback,
+                     parameter=callback, tap=tap_callback, sort=sort_callback, scenario=scenario_callback)
+    for name, model in callbacks.items():
+        model.code = callback_code(name, model.code, telemetry)
+    if telemetry:
+        ready_callback.code = TELEMETRY_JS + ready_callback.code
+    return doc
+
+
+# Write `doc` out as a standalone HTML page
+def write_page(doc, output_path):
+    # Serialise the document once, for both the size report and the page (what file_html does)
+    with build_metrics.stage('serialise'):
+        docs_json, render_items = standalone_docs_json_and_render_items(doc.roots)
+
+    # Print the page size breakdown and stop the build if any payload is embedded twice
+    with build_metrics.stage('payload report'):
+        report_payload(next(iter(docs_json.values())))
+
+    with build_metrics.stage('html'):
+        html = html_page_for_render_items(bundle_for_objs_and_resources([doc], CDN), docs_json, render_items,
+                                          title="Climate Data Map")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        build_metrics.note(html_kb=round(len(html) / 1024, 1))
+    return output_path
+
+
+# Build the map page for the given scenarios (the first one is shown when the page opens)
+def build_page(districts, scenario_attributes, output_path, cache_dir=CACHE_DIR, classification='linear', n_classes=None,
+               telemetry=False, period=PERIOD):
+    with build_metrics.stage('document'):
+        doc = build_document(districts, scenario_attributes, os.path.splitext(output_path)[0], cache_dir, classification, n_classes,
+                             telemetry, period)
+    return write_page(doc, output_path)
+
+
+if __name__ == '__main__':
+    all_periods = sorted({period for scenario in SCENARIOS.values() for period in scenario['layers']})
+    parser = argparse.ArgumentParser(description="Build the climate data map page")
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--period', default=PERIOD, choices=all_periods, help="projection period to show")
+    parser.add_argument('--output', default='climate_map.html')
+    parser.add_argument('--show', action='store_true', help="open the page in a browser when done")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="where to keep the build cache")
+    parser.add_argument('--no-cache', action='store_true', help="rebuild everything and keep no cache")
+    parser.add_argument('--no-differences', action='store_true',
+                        help="leave out the difference layers of the scenarios built (e.g. ssp585-ssp245)")
+    parser.add_argument('--classes', default='linear', choices=CLASS_METHODS, help="how to split each parameter into colours")
+    parser.add_argument('--num-classes', type=class_count, help="number of colours (default: 256 for linear, 7 otherwise)")
+    parser.add_argument('--metrics', help="append every stage's timing and memory to this file as JSON lines ('-' for stdout)")
+    parser.add_argument('--profile', help="write a cProfile dump of the whole build to this file")
+    parser.add_argument('--telemetry', action='store_true',
+                        help="time every callback in the page (see map_telemetry in the browser console)")
+    args = parser.parse_args()
+    missing = [key for key in args.scenarios if args.period not in SCENARIOS[key]['layers']]
+    if missing:
+        parser.error(f"no {args.period} layer for {', '.join(missing)}")
+
+    if args.metrics:
+        build_metrics.start(args.metrics, output=args.output, scenarios=args.scenarios, period=args.period, classes=args.classes,
+                            code=CODE_VERSION[1][:12], no_cache=args.no_cache, telemetry=args.telemetry)
+    # --no-cache builds through a throwaway cache directory. With the metrics on stdout, the
+    # progress messages go to stderr so stdout stays JSON lines
+    progress = redirect_stdout(sys.stderr) if args.metrics == '-' else nullcontext()
+    with progress, build_metrics.profiled(args.profile), build_metrics.stage('build'):
+        with tempfile.TemporaryDirectory() if args.no_cache else nullcontext(args.cache_dir) as cache_dir:
+            # A throwaway cache is deleted while the layers are still in use, so it is not mapped
+            memory_map = not args.no_cache
+            districts = measured("district geometry", lambda: load_districts(cache_dir=cache_dir, memory_map=memory_map))
+            scenario_attributes = {key: measured(key, lambda: load_scenario_attributes(key, districts, cache_dir, args.period,
+                                                                                       memory_map))
+                                   for key in args.scenarios}
+            # Every difference layer whose scenarios are both on the page comes after them
+            for key, difference in DIFFERENCES.items():
+                if not args.no_differences and all(k in scenario_attributes for k in difference['scenarios']):
+                    scenario_attributes[key] = measured(key, lambda: difference_attributes(key, districts, cache_dir, args.period,
+                                                                                          memory_map))
+            page = build_page(districts, scenario_attributes, args.output, cache_dir, args.classes, args.num_classes,
+                              args.telemetry, args.period)
+        print(f"Wrote {page}")
+        if not args.no_cache:
+            with build_metrics.stage('evict'):
+                removed = evict(args.cache_dir)
+            if removed:
+                print(f"Evicted {removed} stale cache entries")
+    build_metrics.stop()
+    if args.show:
+        view(os.path.abspath(page))
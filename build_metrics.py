@@ -0,0 +1,124 @@
+import cProfile
+import json
+import resource
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+# Timing of the build stages (reading the layers, reprojection, simplification, the Bokeh
+# document, serialisation, the HTML write), as one JSON line per stage, so builds can be
+# monitored and compared over time. Every line carries the run's id and start time, the
+# stage's name, wall and CPU time, resident memory at its end and peak resident memory
+# during it, plus what the stage adds (cache hit, sizes). Stages nest; a stage's peak
+# includes its inner stages'. Nothing is recorded until start() is called.
+# Peak memory is per stage where Linux lets a process reset its high-water mark, otherwise
+# it is the peak of the process so far.
+
+_out = None
+_run = {}
+# Peak resident memory of every open stage so far, innermost last, and their extra fields
+_stack = []
+
+
+# Resident memory of this process now and its peak (since the last reset), in bytes
+def _memory():
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+        return int(status['VmRSS'].split()[0]) * 1024, int(status['VmHWM'].split()[0]) * 1024
+    except (OSError, KeyError):
+        # ru_maxrss is in kB on Linux, bytes on macOS; there is no current size
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == 'darwin' else 1024
+        return peak, peak
+
+
+# Reset the peak resident memory to the current one (Linux only; else a no-op)
+def _reset_peak():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+# Record the stages from now on as JSON lines appended to `path` ('-' for stdout), every
+# line also carrying `fields` (e.g. what was built)
+def start(path, **fields):
+    global _out
+    _out = sys.stdout if path == '-' else open(path, 'a', encoding='utf-8')
+    _run.clear()
+    # A forked worker starts recording afresh
+    _stack.clear()
+    _run.update(run=uuid.uuid4().hex[:12], started=time.strftime('%Y-%m-%dT%H:%M:%S%z'), **fields)
+
+
+def stop():
+    global _out
+    if _out is not None and _out is not sys.stdout:
+        _out.close()
+    _out = None
+
+
+# Add `fields` to the line of the innermost open stage (e.g. cache='hit')
+def note(**fields):
+    if _stack:
+        _stack[-1][1].update(fields)
+
+
+# Run `run()`; returns its result and the peak resident memory of the process while it ran,
+# in bytes (where the peak cannot be reset, the peak of the process so far). Works whether
+# or not stages are being recorded, and keeps the peak of the enclosing stage.
+def peak_rss(run):
+    if _stack:
+        _stack[-1][0] = max(_stack[-1][0], _memory()[1])
+    _reset_peak()
+    result = run()
+    peak = _memory()[1]
+    if _stack:
+        # Stages inside `run()` reset the peak too and hand theirs to the enclosing stage
+        peak = _stack[-1][0] = max(_stack[-1][0], peak)
+    return result, peak
+
+
+# Time the code in the `with` block as stage `name`
+@contextmanager
+def stage(name, **fields):
+    if _out is None:
+        yield
+        return
+    if _stack:
+        _stack[-1][0] = max(_stack[-1][0], _memory()[1])
+    _reset_peak()
+    _stack.append([0, dict(fields)])
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        rss, peak = _memory()
+        inner_peak, extra = _stack.pop()
+        peak = max(peak, inner_peak)
+        if _stack:
+            _stack[-1][0] = max(_stack[-1][0], peak)
+        line = dict(_run, stage=name, ms=round(wall * 1000, 1), cpu_ms=round(cpu * 1000, 1),
+                    rss_mb=round(rss / 2**20, 1), peak_rss_mb=round(peak / 2**20, 1), **extra)
+        _out.write(json.dumps(line) + '\n')
+        _out.flush()
+
+
+# Profile the code in the `with` block with cProfile and write the stats to `path` (for
+# pstats, snakeviz, ...); does nothing when `path` is None
+@contextmanager
+def profiled(path):
+    if path is None:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
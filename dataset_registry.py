@@ -0,0 +1,86 @@
+import os
+import threading
+
+import geopandas as gpd
+import numpy as np
+
+from build_cache import CACHE_DIR
+from build_maps import load_districts, scenario_attributes_entry, district_layer_entry, measured, colour_scales as build_colour_scales
+from geo_utils import to_patches_columns
+from layer_store import open_layer
+from scenarios import scenario_parameters
+
+# Process-wide, read-only registry of the data the server sessions look at (serve_maps.py).
+# The districts and each scenario's parameters are loaded once per process, the first time
+# a session asks for them, and every session gets the same arrays. Sessions only keep
+# references: what they change (selection, plot sources) is their own. A shared column is
+# never modified in place. A session that needs a different one replaces it with its own
+# copy. The shared arrays are flagged read-only, so an in-place write fails (and Bokeh
+# refuses a ColumnDataSource.patch of a shared column) instead of reaching other sessions.
+
+_lock = threading.RLock()
+_loaded = {}
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+# `load()` the first time `name` is asked for, the same object every time after
+def _shared(name, load):
+    with _lock:
+        if name not in _loaded:
+            _loaded[name] = load()
+        return _loaded[name]
+
+
+# The districts: their GeoDataFrame, the coarse map geometry as patches columns, the names
+# of every row, and the rows of all and of every state
+def districts(cache_dir=CACHE_DIR):
+    def load():
+        gdf = measured("district geometry", lambda: load_districts(cache_dir=cache_dir))
+        coarse = gpd.read_file(os.path.join(district_layer_entry(gdf, cache_dir), 'coarse.geojson'))
+        xs, ys = to_patches_columns(coarse.geometry.values)
+        state_indices = gdf.groupby('State', observed=True).indices
+        return dict(
+            gdf=gdf,
+            bounds=_read_only(gdf.total_bounds),
+            # Tuples, so the columns themselves cannot be appended to either
+            xs=tuple(_read_only(x) for x in xs),
+            ys=tuple(_read_only(y) for y in ys),
+            rows=_read_only(np.arange(len(gdf))),
+            names=_read_only(gdf['District'].astype(str).to_numpy()),
+            state_names=_read_only(gdf['State'].astype(str).to_numpy()),
+            states=tuple(gdf['State'].cat.categories),
+            state_rows={state: _read_only(rows.astype('int32')) for state, rows in state_indices.items()},
+        )
+
+    return _shared(('districts', cache_dir), load)
+
+
+# One scenario's parameters, {parameter code: float32 array}, lined up with the districts.
+# The arrays are views of the scenario's memory-mapped cache entry (no copy, read-only),
+# so server processes on one machine share a single copy of them.
+def scenario(key, cache_dir=CACHE_DIR):
+    def load():
+        entry = scenario_attributes_entry(key, districts(cache_dir)['gdf'], cache_dir)
+        parameters = scenario_parameters(key)
+        table = open_layer(os.path.join(entry, 'attributes.arrow'), parameters).combine_chunks()
+        return {param: table[param].chunk(0).to_numpy(zero_copy_only=True) for param in parameters}
+
+    return _shared(('scenario', key, cache_dir), lambda: measured(key, load))
+
+
+# One scenario's colour scales, {parameter code: scale} as build_maps.colour_scales makes
+# them (class of every district, class palette, colour bar ticks and labels)
+def colour_scales(key, cache_dir=CACHE_DIR, method='linear', n_classes=None):
+    def load():
+        values = scenario(key, cache_dir)
+        scales = build_colour_scales(values, list(values), method, n_classes)
+        for scale in scales.values():
+            _read_only(scale['classes'])
+            scale['palette'] = tuple(scale['palette'])
+        return scales
+
+    return _shared(('colour scales', key, cache_dir, method, n_classes), load)
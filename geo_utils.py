@@ -0,0 +1,315 @@
+import datetime
+import io
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyogrio
+import shapely
+from pyproj import Transformer
+
+
+# Transformers are expensive to build, so keep one per CRS pair for the whole process
+# (every scenario reprojects from the same lat/lon CRS to Web Mercator)
+@lru_cache(maxsize=None)
+def get_transformer(src_crs="epsg:4326", dst_crs="epsg:3857"):
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+# Function to transform lat/lon to Web Mercator
+# All vertices of the GeoSeries are pulled out as one (n, 2) array, projected with a
+# single batched pyproj call and written back, instead of one Python callback per polygon
+def transform_to_web_mercator(gdf):
+    transformer = get_transformer()
+
+    def project(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+
+    geoms = shapely.transform(gdf['geometry'].values, project)
+    gdf = gdf.set_geometry(geoms, crs="epsg:3857")
+    return gdf
+
+
+# Convert NaN/NA/NaT attribute values to None so they are written as JSON null, and dates
+# and times to ISO strings, as GeoDataFrame.to_json does
+def _json_value(value):
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+# Function to serialise a GeoDataFrame straight to a GeoJSON FeatureCollection string
+# Features are written in batches of `batch_size`, so only one batch of geometry strings
+# is alive at a time next to the output. Coordinates are rounded to `precision` decimals
+# (Web Mercator metres, so 2 means centimetres); pass precision=None to keep them as-is.
+# If `out` is a writable text file the payload is streamed into it and nothing is returned.
+def to_geojson(gdf, precision=2, out=None, batch_size=256):
+    buffer = out if out is not None else io.StringIO()
+    geometry_name = gdf.geometry.name
+    properties = [col for col in gdf.columns if col != geometry_name]
+    property_keys = [json.dumps(str(col)) for col in properties]
+    geoms = gdf.geometry.values
+
+    buffer.write('{"type": "FeatureCollection", "features": [')
+    for start in range(0, len(gdf), batch_size):
+        stop = min(start + batch_size, len(gdf))
+        batch = np.asarray(geoms[start:stop])
+        if precision is not None:
+            batch = shapely.transform(batch, lambda coords: np.round(coords, precision))
+        geometry_json = shapely.to_geojson(batch)
+        columns = [gdf[col].iloc[start:stop].tolist() for col in properties]
+
+        for i, row in enumerate(zip(*columns)):
+            props = ", ".join(f"{key}: {json.dumps(_json_value(value), default=str)}" for key, value in zip(property_keys, row))
+            geometry = geometry_json[i] if geometry_json[i] is not None else "null"
+            separator = ", " if start + i > 0 else ""
+            buffer.write(f'{separator}{{"type": "Feature", "properties": {{{props}}}, "geometry": {geometry}}}')
+    buffer.write(']}')
+
+    if out is None:
+        return buffer.getvalue()
+
+
+# Function to pack numeric attribute columns as little-endian float32 arrays. Bokeh ships
+# NumPy columns of a ColumnDataSource as base64 binary that the page loads straight into
+# Float32Arrays, instead of one JSON number per district per column.
+def to_float32_columns(gdf, columns):
+    return {col: gdf[col].to_numpy(dtype='<f4') for col in columns}
+
+
+# Function to read only `columns` of a layer's attribute table (no geometry) through
+# pyogrio's Arrow reader, so the DBF fields nobody asked for are never decoded. Columns in
+# `dtypes` ({column: numeric dtype}) come back as that dtype with missing values set to 0,
+# the others as categoricals.
+def read_attribute_columns(path, columns, dtypes=None):
+    dtypes = dtypes or {}
+    _, table = pyogrio.read_arrow(path, columns=columns, read_geometry=False)
+    data = {}
+    for name in columns:
+        column = table.column(name)
+        if name in dtypes:
+            dtype = np.dtype(dtypes[name])
+            values = pc.cast(pc.fill_null(column, 0), pa.from_numpy_dtype(dtype)).to_numpy()
+            data[name] = np.where(np.isnan(values), dtype.type(0), values) if dtype.kind == 'f' else values
+        else:
+            data[name] = column.dictionary_encode().to_pandas()
+    return pd.DataFrame(data)
+
+
+# Split every ring of the layer into arcs at the vertices where neighbouring rings meet or
+# part (the TopoJSON junction rule), so each shared boundary is stored exactly once.
+# Returns the unique arcs (as vertex coordinate arrays) and, for every ring, the list of
+# (arc index, reversed) pieces it is made of.
+def _build_arcs(polygons):
+    rings, ring_polygon = shapely.get_rings(polygons, return_index=True)
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+
+    # Drop the closing vertex of every ring so each ring is a plain cycle
+    ring_sizes = np.bincount(ring_index, minlength=len(rings))
+    ring_ends = np.cumsum(ring_sizes)
+    keep = np.ones(len(coords), dtype=bool)
+    keep[ring_ends - 1] = False
+    coords, ring_index = coords[keep], ring_index[keep]
+    ring_sizes = ring_sizes - 1
+    ring_starts = np.concatenate([[0], np.cumsum(ring_sizes)[:-1]])
+
+    vertices, vertex_ids = np.unique(coords, axis=0, return_inverse=True)
+    vertex_ids = vertex_ids.ravel()
+
+    # A vertex is a junction when its neighbours differ between the rings passing through it
+    position = np.arange(len(coords)) - ring_starts[ring_index]
+    size = ring_sizes[ring_index]
+    prev_ids = vertex_ids[ring_starts[ring_index] + (position - 1) % size]
+    next_ids = vertex_ids[ring_starts[ring_index] + (position + 1) % size]
+    pairs = np.column_stack([vertex_ids, np.minimum(prev_ids, next_ids), np.maximum(prev_ids, next_ids)])
+    distinct = np.unique(pairs, axis=0)
+    is_junction = np.bincount(distinct[:, 0], minlength=len(vertices)) > 1
+
+    arcs, arc_lookup, ring_arcs = [], {}, []
+    for r in range(len(rings)):
+        ids = vertex_ids[ring_starts[r]:ring_starts[r] + ring_sizes[r]]
+        cuts = np.flatnonzero(is_junction[ids])
+        if len(cuts) == 0:
+            # Closed ring with no junction: start at the lowest vertex so an island and the
+            # hole it fills produce the same arc
+            ids = np.roll(ids, -int(np.argmin(ids)))
+            pieces = [np.append(ids, ids[0])]
+        else:
+            ids = np.roll(ids, -int(cuts[0]))
+            cuts = np.append(cuts - cuts[0], len(ids))
+            ids = np.append(ids, ids[0])
+            pieces = [ids[cuts[k]:cuts[k + 1] + 1] for k in range(len(cuts) - 1)]
+
+        ring_pieces = []
+        for piece in pieces:
+            forward, backward = piece.tobytes(), piece[::-1].tobytes()
+            key = min(forward, backward)
+            if key not in arc_lookup:
+                arc_lookup[key] = len(arcs)
+                arcs.append(vertices[piece if key == forward else piece[::-1]])
+            ring_pieces.append((arc_lookup[key], key != forward))
+        ring_arcs.append(ring_pieces)
+
+    return arcs, ring_arcs, ring_polygon
+
+
+# Topology-aware simplification: every shared boundary arc is simplified once and reused by
+# both neighbours, so adjacent districts keep identical edges. Arcs are simplified
+# independently of each other, so at coarse tolerances two arcs can still cross and leave
+# small gaps or overlaps. Returns one geometry array per tolerance (in the layer's units),
+# in the same row order. Rings that collapse are dropped (a polygon whose exterior
+# collapses is dropped with its holes); a feature that would vanish keeps its original geometry.
+def simplify_shared_boundaries(geoms, tolerances):
+    geoms = np.asarray(geoms)
+    polygons, polygon_feature = shapely.get_parts(geoms, return_index=True)
+    arcs, ring_arcs, ring_polygon = _build_arcs(polygons)
+    lines = shapely.linestrings(np.concatenate(arcs), indices=np.repeat(np.arange(len(arcs)), [len(a) for a in arcs]))
+
+    levels = []
+    for tolerance in tolerances:
+        simplified = shapely.get_coordinates(shapely.simplify(lines, tolerance, preserve_topology=True), return_index=True)
+        arc_coords = np.split(simplified[0], np.flatnonzero(np.diff(simplified[1])) + 1)
+
+        polygon_rings = [[] for _ in range(len(polygons))]
+        for r, pieces in enumerate(ring_arcs):
+            parts = [arc_coords[a][::-1] if rev else arc_coords[a] for a, rev in pieces]
+            ring = np.concatenate([parts[0]] + [part[1:] for part in parts[1:]])
+            rings = polygon_rings[ring_polygon[r]]
+            if rings is None:
+                # The polygon's exterior collapsed; its holes go with it
+                continue
+            if len(ring) < 4 or shapely.area(shapely.polygons(ring)) == 0:
+                if not rings:
+                    polygon_rings[ring_polygon[r]] = None
+                continue
+            rings.append(ring)
+
+        feature_parts = [[] for _ in range(len(geoms))]
+        for p, ring_list in enumerate(polygon_rings):
+            if ring_list:
+                feature_parts[polygon_feature[p]].append(shapely.Polygon(ring_list[0], ring_list[1:]))
+
+        level = np.empty(len(geoms), dtype=object)
+        for i, parts in enumerate(feature_parts):
+            if not parts:
+                level[i] = geoms[i]
+            elif len(parts) == 1 and shapely.get_type_id(geoms[i]) == shapely.GeometryType.POLYGON:
+                level[i] = parts[0]
+            else:
+                level[i] = shapely.multipolygons(parts)
+        levels.append(level)
+    return levels
+
+
+# Function to write the columnar xs/ys that p.patches draws, the same way GeoJSONDataSource
+# flattens polygons (exterior rings only, MultiPolygon parts separated by a gap). Gaps are
+# written as null since JSON has no NaN; the page turns them back into NaN when it loads them.
+# If `rows` is given it is written first, as the layer row of each geometry.
+def to_patches_json(geoms, precision=2, out=None, rows=None):
+    buffer = out if out is not None else io.StringIO()
+    if rows is not None:
+        buffer.write('{"rows": ' + json.dumps([int(row) for row in rows]) + ', ')
+    polygons, feature = shapely.get_parts(np.asarray(geoms), return_index=True)
+    coords, part = shapely.get_coordinates(shapely.get_exterior_ring(polygons), return_index=True)
+    if precision is not None:
+        coords = np.round(coords, precision)
+    part_bounds = np.concatenate([[0], np.cumsum(np.bincount(part, minlength=len(polygons)))])
+    feature_bounds = np.searchsorted(feature, np.arange(len(geoms) + 1))
+
+    for axis, name in enumerate(["xs", "ys"]):
+        buffer.write(('{' if axis == 0 and rows is None else ', ' if axis else '') + f'"{name}": [')
+        for i in range(len(geoms)):
+            parts = range(feature_bounds[i], feature_bounds[i + 1])
+            values = [",".join(map(repr, coords[part_bounds[p]:part_bounds[p + 1], axis].tolist())) for p in parts]
+            buffer.write(("," if i > 0 else "") + "[" + ",null,".join(values) + "]")
+        buffer.write(']')
+    buffer.write('}')
+
+    if out is None:
+        return buffer.getvalue()
+
+
+# The same columns as arrays, for a ColumnDataSource: one float64 array per geometry, its
+# polygon exteriors separated by NaN. Returns (xs, ys).
+def to_patches_columns(geoms):
+    polygons, feature = shapely.get_parts(np.asarray(geoms), return_index=True)
+    coords, part = shapely.get_coordinates(shapely.get_exterior_ring(polygons), return_index=True)
+    part_bounds = np.concatenate([[0], np.cumsum(np.bincount(part, minlength=len(polygons)))])
+    feature_bounds = np.searchsorted(feature, np.arange(len(geoms) + 1))
+    gap = np.full((1, 2), np.nan)
+
+    xs, ys = [], []
+    for i in range(len(geoms)):
+        parts = []
+        for p in range(feature_bounds[i], feature_bounds[i + 1]):
+            parts += [gap, coords[part_bounds[p]:part_bounds[p + 1]]] if parts else [coords[part_bounds[p]:part_bounds[p + 1]]]
+        joined = np.concatenate(parts) if parts else np.empty((0, 2))
+        xs.append(np.ascontiguousarray(joined[:, 0]))
+        ys.append(np.ascontiguousarray(joined[:, 1]))
+    return xs, ys
+
+
+# Half the width of the Web Mercator world, in metres
+WORLD_HALF_WIDTH = 20037508.342789244
+
+
+# Column (x) and row (y) range of the z/x/y tiles covering `bounds` at zoom `z`
+def tile_range(bounds, z):
+    size = 2 * WORLD_HALF_WIDTH / 2 ** z
+    xmin, ymin, xmax, ymax = bounds
+    last = 2 ** z - 1
+    x0, x1 = (int(np.clip((v + WORLD_HALF_WIDTH) // size, 0, last)) for v in (xmin, xmax))
+    y0, y1 = (int(np.clip((WORLD_HALF_WIDTH - v) // size, 0, last)) for v in (ymax, ymin))
+    return x0, x1, y0, y1
+
+
+# Function to build the zoom-dependent geometry of a map page. The coarsest level, half a
+# screen pixel at the full-extent view, is returned so the page can embed it. Finer
+# levels are cut into a z/x/y tile pyramid (the usual Web Mercator grid) under `out_dir`,
+# so the page only fetches the tiles in view: `levels` zooms past the one matching the
+# full-extent view, simplified to half a tile pixel, the last at full resolution.
+# Each tile `<z>/<x>/<y>.json` holds the whole geometry of every feature intersecting it
+# (not clipped, so no tile edges are drawn) as patches columns plus their layer rows.
+# Returns the coarse geometry and {z: ["x/y", ...]} of the tiles written.
+def build_tile_pyramid(gdf, out_dir, plot_width=900, levels=3, precision=2, tile_pixels=256):
+    geoms = np.asarray(gdf.geometry.values)
+    bounds = gdf.total_bounds
+    pixel = (bounds[2] - bounds[0]) / plot_width
+    # The zoom that matches the full-extent view is served by the coarse level; tiles start
+    # one zoom finer
+    first_zoom = int(np.ceil(np.log2(2 * WORLD_HALF_WIDTH / (tile_pixels * pixel)))) + 1
+    zooms = list(range(first_zoom, first_zoom + levels))
+    tolerances = [2 * WORLD_HALF_WIDTH / 2 ** z / tile_pixels / 2 for z in zooms[:-1]]
+    coarse, *tiled = simplify_shared_boundaries(geoms, [pixel / 2] + tolerances)
+    tiled.append(geoms)
+
+    tree = shapely.STRtree(geoms)
+    tile_index = {}
+    for z, level in zip(zooms, tiled):
+        x0, x1, y0, y1 = tile_range(bounds, z)
+        xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        xs, ys = xs.ravel(), ys.ravel()
+        size = 2 * WORLD_HALF_WIDTH / 2 ** z
+        boxes = shapely.box(xs * size - WORLD_HALF_WIDTH, WORLD_HALF_WIDTH - (ys + 1) * size,
+                            (xs + 1) * size - WORLD_HALF_WIDTH, WORLD_HALF_WIDTH - ys * size)
+        tiles, rows = tree.query(boxes, predicate='intersects')
+        order = np.lexsort((rows, tiles))
+        tiles, rows = tiles[order], rows[order]
+
+        keys = []
+        starts = np.flatnonzero(np.r_[True, np.diff(tiles) != 0]) if len(tiles) else np.empty(0, int)
+        for tile, tile_rows in zip(tiles[starts], np.split(rows, starts[1:])):
+            key = f"{xs[tile]}/{ys[tile]}"
+            os.makedirs(os.path.join(out_dir, str(z), str(xs[tile])), exist_ok=True)
+            with open(os.path.join(out_dir, str(z), f"{key}.json"), "w") as f:
+                to_patches_json(level[tile_rows], precision=precision, out=f, rows=tile_rows)
+            keys.append(key)
+        tile_index[z] = keys
+    return coarse, tile_index
@@ -0,0 +1,81 @@
+import argparse
+import os
+import shutil
+
+import geopandas as gpd
+import pyarrow as pa
+
+# Arrow IPC files (uncompressed) for the intermediate layers of the build: the reprojected
+# district geometry (GeoArrow-encoded, with its CRS) and every scenario's parameters. They
+# are the build cache's entries (build_maps.py), written once from the shapefiles. Unlike
+# parquet, such a file is read by memory-mapping it. Opening it costs next to no time or
+# memory, and its columns are views of the file's pages (read-only). Processes reading the
+# same file (batch build workers, server processes, notebooks) share one copy of it in the
+# page cache, instead of each decoding its own.
+# Usage: python layer_store.py [--out DIR] [--cache-dir DIR]
+# converts the layers if the cache does not hold them yet, and links them into DIR as
+# districts.arrow and <scenario>_<period>.arrow for notebooks:
+#     layer_store.read_geo_layer('store/districts.arrow')
+#     layer_store.open_layer('store/ssp585_2021-2040.arrow').column('wet_bulb_annual')
+
+
+# Write a DataFrame, or a GeoDataFrame with its geometry as GeoArrow, to `path`
+def write_layer(frame, path):
+    if isinstance(frame, gpd.GeoDataFrame):
+        table = pa.table(frame.to_arrow(geometry_encoding='geoarrow', index=False))
+    else:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    with pa.OSFile(path, 'wb') as f, pa.ipc.new_file(f, table.schema) as writer:
+        writer.write_table(table)
+
+
+# The table at `path` (only `columns`, if given), memory-mapped. With memory_map=False it
+# is read into memory and the file closed, so it can be deleted while the table is in use
+# (Windows does not delete a file that is mapped).
+def open_layer(path, columns=None, memory_map=True):
+    if memory_map:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    else:
+        with pa.OSFile(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+    return table if columns is None else table.select(columns)
+
+
+# The layer at `path` as a DataFrame; numeric columns stay views of the file (or of the
+# table read into memory)
+def read_layer(path, columns=None, memory_map=True):
+    return open_layer(path, columns, memory_map).to_pandas(split_blocks=True)
+
+
+# The layer at `path` as a GeoDataFrame; the geometry is decoded into shapely objects
+def read_geo_layer(path, memory_map=True):
+    return gpd.GeoDataFrame.from_arrow(open_layer(path, memory_map=memory_map))
+
+
+if __name__ == '__main__':
+    from build_cache import CACHE_DIR
+    from build_maps import load_districts, scenario_attributes_entry
+    from scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Convert the district and scenario layers to memory-mappable Arrow files")
+    parser.add_argument('--out', default='store', help="directory to link the files into")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="where to keep the build cache")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    districts = load_districts(cache_dir=args.cache_dir)
+    files = {'districts.arrow': os.path.join(args.cache_dir, districts.attrs['cache_key'], 'districts.arrow')}
+    for key, scenario in SCENARIOS.items():
+        for period in scenario['layers']:
+            entry = scenario_attributes_entry(key, districts, args.cache_dir, period)
+            files[f'{key}_{period}.arrow'] = os.path.join(entry, 'attributes.arrow')
+    for name, path in files.items():
+        target = os.path.join(args.out, name)
+        if os.path.exists(target):
+            os.remove(target)
+        # Hard-link where the filesystem allows it (evicting the entry leaves the file here)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+        print(f"{target}: {os.path.getsize(target) / 2**20:.1f} MB")
@@ -0,0 +1,90 @@
+# Web Worker for the map page. It takes the work that would otherwise stall panning and
+# zooming off the UI thread: fetching, parsing and converting the map tiles, and ranking
+# values for the bar plot. The page starts it from a Blob, so it also runs when the page
+# is opened from disk.
+
+# Every request is {id, op, ...}; the reply is {id, result} or {id, error}. Large results
+# are transferred (not copied) back to the page.
+WORKER_JS = """
+const handlers = {
+    // One file of patches columns: {xs: [...], ys: [...]} with null between polygon parts, and
+    // optionally the layer `rows` they belong to. Returned as one Float64Array per geometry
+    // with NaN gaps, as p.patches expects.
+    async patches({url}) {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`${url}: ${response.status}`);
+        }
+        const columns = await response.json();
+        const convert = col => col.map(coords => Float64Array.from(coords, v => v === null ? NaN : v));
+        const xs = convert(columns.xs);
+        const ys = convert(columns.ys);
+        const result = {xs, ys};
+        const transfer = xs.concat(ys).map(a => a.buffer);
+        if (columns.rows) {
+            result.rows = Int32Array.from(columns.rows);
+            transfer.push(result.rows.buffer);
+        }
+        return {result, transfer};
+    },
+
+    // Order of `values` (indices), ascending or descending; NaN values go last
+    rank({values, descending}) {
+        const order = Int32Array.from(values, (_, i) => i);
+        const sign = descending ? -1 : 1;
+        order.sort((a, b) => {
+            const x = values[a], y = values[b];
+            if (x !== x || y !== y) {
+                return (x !== x) - (y !== y);
+            }
+            return sign * (x - y) || a - b;
+        });
+        return {result: order, transfer: [order.buffer]};
+    },
+};
+
+self.onmessage = async (event) => {
+    const {id, op} = event.data;
+    try {
+        const {result, transfer} = await handlers[op](event.data);
+        self.postMessage({id, result}, transfer);
+    } catch (error) {
+        self.postMessage({id, error: String(error)});
+    }
+};
+"""
+
+# Main-thread side, run once when the page is ready, with args `worker_source` (WORKER_JS)
+# and `host` (a model the callbacks share): starts the worker and leaves a
+# request(message) -> Promise client on `host._worker`. If workers are unavailable the
+# same handlers run on the page instead, so callers never need a fallback.
+CLIENT_JS = """
+        const host_source = worker_source + "\\nself.handlers = handlers;";
+        let post = null;
+        try {
+            const worker = new Worker(URL.createObjectURL(new Blob([worker_source], {type: 'text/javascript'})));
+            const pending = new Map();
+            worker.onmessage = (event) => {
+                const {id, result, error} = event.data;
+                const request = pending.get(id);
+                pending.delete(id);
+                if (error !== undefined) {
+                    request.reject(new Error(error));
+                } else {
+                    request.resolve(result);
+                }
+            };
+            let next_id = 0;
+            post = (message) => new Promise((resolve, reject) => {
+                const id = next_id++;
+                pending.set(id, {resolve, reject});
+                worker.postMessage(Object.assign({id}, message));
+            });
+        } catch (error) {
+            console.warn("map worker unavailable, running its handlers on the page", error);
+            const scope = {postMessage() {}};
+            new Function('self', host_source)(scope);
+            post = async (message) => (await scope.handlers[message.op](message)).result;
+        }
+        host._worker = {request: post};
+"""
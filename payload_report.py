@@ -0,0 +1,89 @@
+import hashlib
+import json
+
+from bokeh.embed import json_item
+
+
+# Turn Bokeh's serialised {"type": "map", "entries": [...]} back into plain dicts and parse
+# large embedded JSON strings (e.g. GeoJSONDataSource.geojson), so the same data shipped
+# once as a string and once as a dict argument hashes the same
+def _decode(node, min_bytes):
+    if isinstance(node, dict):
+        if node.get("type") == "map" and "entries" in node:
+            return {str(key): _decode(value, min_bytes) for key, value in node["entries"]}
+        return {key: _decode(value, min_bytes) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_decode(value, min_bytes) for value in node]
+    if isinstance(node, str) and len(node) >= min_bytes and node[:1] in "{[":
+        try:
+            return _decode(json.loads(node), min_bytes)
+        except ValueError:
+            return node
+    return node
+
+
+# Hash every node bottom-up (one pass) and record the size and path of the large ones.
+# Nodes that contain other model definitions are flagged so the report can skip containers.
+def _hash_nodes(node, path, min_bytes, found):
+    has_model = False
+    if isinstance(node, dict):
+        if node.get("type") == "object" and "name" in node:
+            path = node["name"]
+            has_model = True
+        parts, size = [], 2
+        for key in sorted(node):
+            digest, child_size, child_model = _hash_nodes(node[key], f"{path}.{key}", min_bytes, found)
+            parts.append(f"{key}={digest}")
+            size += len(key) + child_size + 4
+            has_model = has_model or child_model
+        text = "{" + ",".join(parts) + "}"
+    elif isinstance(node, list):
+        parts, size = [], 2
+        for i, value in enumerate(node):
+            digest, child_size, child_model = _hash_nodes(value, f"{path}[{i}]", min_bytes, found)
+            parts.append(digest)
+            size += child_size + 1
+            has_model = has_model or child_model
+        text = "[" + ",".join(parts) + "]"
+    else:
+        text = json.dumps(node)
+        size = len(text)
+
+    digest = hashlib.sha1(text.encode()).hexdigest()
+    if size >= min_bytes:
+        found.append((digest, size, path, has_model))
+    return digest, size, has_model
+
+
+# Build-time size report for a Bokeh layout (or a document already serialised to JSON, as
+# a dict): prints the total document size and the largest payloads, and raises ValueError
+# if the same large payload is embedded more than once
+def report_payload(layout, min_bytes=64 * 1024, top=5):
+    doc = layout if isinstance(layout, dict) else json_item(layout)["doc"]
+    total = len(json.dumps(doc))
+
+    found = []
+    _hash_nodes(_decode(doc, min_bytes), "doc", min_bytes, found)
+
+    by_digest = {}
+    for digest, size, path, _ in found:
+        by_digest.setdefault(digest, []).append((size, path))
+    # Only report the outermost copy of a duplicate, not every nested piece of it
+    duplicates = []
+    reported = []
+    for digest, copies in sorted(by_digest.items(), key=lambda item: -item[1][0][0]):
+        paths = [path for _, path in copies]
+        if len(copies) > 1 and not any(p.startswith(r) for p in paths for r in reported):
+            duplicates.append((copies[0][0], paths))
+            reported.extend(paths)
+
+    print(f"Document payload: {total / 1024:.1f} KB")
+    attributes = [(size, path) for _, size, path, has_model in found
+                  if not has_model and path.count(".") == 2 and ".attributes." in path]
+    for size, path in sorted(attributes, reverse=True)[:top]:
+        print(f"  {size / 1024:10.1f} KB  {path.replace('.attributes', '')}")
+
+    if duplicates:
+        lines = [f"{size / 1024:.1f} KB at {', '.join(paths)}" for size, paths in duplicates]
+        raise ValueError("Duplicate payloads embedded in the document:\n  " + "\n  ".join(lines).replace(".attributes", ""))
+    return total
@@ -0,0 +1,197 @@
+import os
+
+from bokeh.palettes import diverging_palette, linear_palette, Greens256, Reds256, Blues256, Oranges256
+
+# Scenario manifest for build_maps.py. Everything that used to differ between the
+# per-scenario scripts (DBF column codes, description, colours) lives here, the parameters
+# in one registry (PARAMETERS) for all scenarios; the district geometry is the same for
+# every scenario and is read once from GEOMETRY_PATH.
+# Difference layers (one scenario minus another) are listed in DIFFERENCES and built from the
+# two scenarios' parameters.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SSP245&585_shp')
+GEOMETRY_PATH = os.path.join(DATA_DIR, 'SSP585_ClimateData_India.shp')
+
+# Projection period built when none is asked for
+PERIOD = "2021-2040"
+
+# Colours of the parameter scales
+red = linear_palette(Reds256[::-1], 256)
+blue = linear_palette(Blues256[::-1], 256)
+green = Greens256[::-1]
+
+# Parameter registry, in the order the parameter dropdown offers them: one entry per
+# parameter, keyed by its short code, which is what the build, the cache and the server
+# know it by. `fields` names its DBF field in each scenario's layers (scenarios without it
+# have none), `label` and `units` are what the page shows, `palette` colours its scale and
+# its values are loaded as `dtype`. `difference_fields`, where given, are the fields a
+# difference layer subtracts instead, for parameters whose `fields` are not the same
+# quantity in every scenario (a change in one, an absolute count in another). Nothing
+# else in a layer is read.
+PARAMETERS = {
+    'tmax_annual': dict(
+        label="Change in annual maximum temperature(C) w.r.t. baseline period (1960s)",
+        units="°C", palette=red, dtype='float32',
+        fields=dict(ssp585='TMAX_Annua', ssp245='TMAX_Annua'),
+    ),
+    'tmax_summer': dict(
+        label="Change in summer maximum temperature(C) w.r.t. baseline period (1960s)",
+        units="°C", palette=red, dtype='float32',
+        fields=dict(ssp585='TMAX_MAM_C', ssp245='TMAX_MAM_C'),
+    ),
+    'tmin_winter': dict(
+        label="Change in winter minimum temperature(C) w.r.t. baseline period (1960s)",
+        units="°C", palette=red, dtype='float32',
+        fields=dict(ssp585='TMIN_DJF_C', ssp245='TMIN_DJF_C'),
+    ),
+    'rf_annual': dict(
+        label="Change in annual Rainfall w.r.t. baseline period (1960s)",
+        units="mm", palette=green, dtype='float32',
+        fields=dict(ssp585='Annual_RF_', ssp245='Annual_RF_'),
+    ),
+    'rf_sw_monsoon': dict(
+        label="Percent change in Southwest monsoon precipitation w.r.t. baseline period (1960s)",
+        units="%", palette=green, dtype='float32',
+        fields=dict(ssp585='JJAS_RF_Ch', ssp245='JJAS_RF_Ch'),
+    ),
+    'rf_ne_monsoon': dict(
+        label="Percent change in Northeast monsoon precipitation w.r.t. baseline period (1960s)",
+        units="%", palette=green, dtype='float32',
+        fields=dict(ssp585='OND_RF_Cha', ssp245='OND_RF_Cha'),
+    ),
+    'r20_sw_monsoon': dict(
+        label="Change in number of days with precipitation greater than 20mm during Southwest monsoon w.r.t. baseline period (1960s)",
+        units="days", palette=green, dtype='float32',
+        fields=dict(ssp585='JJAS_R20_1', ssp245='JJAS_R20MM'),
+        difference_fields=dict(ssp585='JJAS_R20MM', ssp245='JJAS_R20MM'),
+    ),
+    'r20_ne_monsoon': dict(
+        label="Change in number of days with precipitation greater than 20mm during Northeast monsoon w.r.t. baseline period (1960s)",
+        units="days", palette=green, dtype='float32',
+        fields=dict(ssp585='OND_R20MM1', ssp245='OND_R20MM_'),
+        difference_fields=dict(ssp585='OND_R20MM_', ssp245='OND_R20MM_'),
+    ),
+    'rx5_sw_monsoon': dict(
+        label="Change in number of 5-day precipitation during Southwest monsoon w.r.t. baseline period (1960s)",
+        units="mm", palette=green, dtype='float32',
+        fields=dict(ssp585='RX5day_JJA', ssp245='RX5day_JJA'),
+    ),
+    'rx5_ne_monsoon': dict(
+        label="Change in number of 5-day precipitation during Northeast monsoon w.r.t. baseline period (1960s)",
+        units="mm", palette=green, dtype='float32',
+        fields=dict(ssp585='RX5day_OND', ssp245='RX5day_OND'),
+    ),
+    'r10_sw_monsoon': dict(
+        label="Change in number of days with precipitation greater than 10mm during Southwest monsoon w.r.t. baseline period (1960s)",
+        units="days", palette=green, dtype='float32',
+        fields=dict(ssp585='JJAS_R10_1', ssp245='JJAS_R10MM'),
+        difference_fields=dict(ssp585='JJAS_R10MM', ssp245='JJAS_R10MM'),
+    ),
+    'r10_ne_monsoon': dict(
+        label="Change in number of days with precipitation greater than 10mm during Northeast monsoon w.r.t. baseline period (1960s)",
+        units="days", palette=green, dtype='float32',
+        fields=dict(ssp585='OND_R10MM1', ssp245='OND_R10MM_'),
+        difference_fields=dict(ssp585='OND_R10MM_', ssp245='OND_R10MM_'),
+    ),
+    'wet_bulb_annual': dict(
+        label="Annual wet bulb temperature (C)",
+        units="°C", palette=red, dtype='float32',
+        fields=dict(ssp585='Annual_Wet', ssp245='Annual_Wet'),
+    ),
+    'wet_bulb_summer': dict(
+        label="Summer wet bulb temperature (C)",
+        units="°C", palette=red, dtype='float32',
+        fields=dict(ssp585='MAM_Wet_Bu', ssp245='MAM_Wet_Bu'),
+    ),
+    'rh_annual': dict(
+        label="Annual change in relative humidity w.r.t. baseline period (1960s)",
+        units="%", palette=blue, dtype='float32',
+        fields=dict(ssp585='Annual_RH_'),
+    ),
+    'rh_summer': dict(
+        label="Change in relative humidity during summer w.r.t. baseline period (1960s)",
+        units="%", palette=blue, dtype='float32',
+        fields=dict(ssp585='MAM_RH_Cha'),
+    ),
+}
+
+# Display name of every parameter, by code
+parameter_labels = {code: parameter['label'] for code, parameter in PARAMETERS.items()}
+
+# Palette of every parameter, by code
+parameter_palettes = {code: parameter['palette'] for code, parameter in PARAMETERS.items()}
+
+# Diverging palettes of the difference layers, by the parameter's own palette: negative
+# differences on the left, no difference in the light middle
+cool_warm = diverging_palette(Blues256, Reds256, 256)
+dry_wet = diverging_palette(Oranges256, Greens256, 256)
+dry_humid = diverging_palette(Oranges256, Blues256, 256)
+difference_palettes = {code: {red: cool_warm, green: dry_wet, blue: dry_humid}[palette]
+                       for code, palette in parameter_palettes.items()}
+
+# One entry per scenario; `layers` maps each projection period to the scenario's layer for
+# it (more SSPs and periods are more entries). Its parameters are the registered ones with a
+# field in its layers; `initial_param` is the code of the one shown first.
+SCENARIOS = {
+    'ssp585': dict(
+        title="SSP585 (Fossil-fueled development)",
+        layers={PERIOD: os.path.join(DATA_DIR, 'SSP585_ClimateData_India.shp')},
+        box_color="#bb7b85",
+        initial_param=None,
+    ),
+    'ssp245': dict(
+        title="SSP245 (Middle of the road)",
+        layers={PERIOD: os.path.join(DATA_DIR, 'SSP245_ClimateData_India.shp')},
+        box_color="#598090",
+        initial_param='rf_annual',
+    ),
+}
+
+
+# One entry per difference layer; `scenarios` is the scenario subtracted from and the one
+# subtracted. It has the parameters both scenarios have, whatever their DBF fields are called.
+DIFFERENCES = {
+    'ssp585-ssp245': dict(
+        title="SSP585 minus SSP245",
+        scenarios=('ssp585', 'ssp245'),
+        box_color="#8a7d8b",
+        initial_param='tmax_annual',
+    ),
+}
+
+
+# Manifest entry of a scenario or difference layer
+def scenario_entry(key):
+    return SCENARIOS[key] if key in SCENARIOS else DIFFERENCES[key]
+
+
+# DBF field of every parameter in a scenario's layers: {field: parameter code}; with
+# difference=True, the fields a difference layer subtracts (see PARAMETERS)
+def scenario_fields(key, difference=False):
+    fields = {code: parameter.get('difference_fields', parameter['fields']) if difference else parameter['fields']
+              for code, parameter in PARAMETERS.items()}
+    return {field[key]: code for code, field in fields.items() if key in field}
+
+
+# Codes of a scenario's (or difference layer's) parameters, in dropdown order
+def scenario_parameters(key):
+    if key in DIFFERENCES:
+        first, second = DIFFERENCES[key]['scenarios']
+        shared = set(scenario_parameters(second))
+        return [param for param in scenario_parameters(first) if param in shared]
+    return list(scenario_fields(key).values())
+
+
+# Heading shown above the map for a scenario
+def scenario_description(key, period=PERIOD):
+    if key in DIFFERENCES:
+        first, second = (SCENARIOS[k]['title'] for k in DIFFERENCES[key]['scenarios'])
+        return (f"<h2>{DIFFERENCES[key]['title']}</h2>"
+                f"<p style='font-size:16px;'>Projected period {period}: {first} minus {second}, district by district</p>")
+    return (f"<h2>{SCENARIOS[key]['title']}</h2>"
+            f"<p style='font-size:16px;'>Projected period {period}, baseline period 1960s</p>")
+
+
+# Shapefile of a scenario's projection for `period`
+def scenario_layer(key, period=PERIOD):
+    return SCENARIOS[key]['layers'][period]
@@ -0,0 +1,283 @@
+import argparse
+import sys
+
+import numpy as np
+from bokeh.core.property.validation import without_property_validation
+from bokeh.io import curdoc
+from bokeh.layouts import column, row
+from bokeh.models import ColumnDataSource, TapTool
+from bokeh.server.server import Server
+
+import dataset_registry
+from build_cache import CACHE_DIR
+from build_maps import map_figure, district_glyphs, side_plots, control_widgets
+from scenarios import SCENARIOS, PARAMETERS, parameter_labels, scenario_description, scenario_parameters
+from stats_utils import box_stats, CLASS_METHODS, class_count
+
+# Live alternative to the static page of build_maps.py: the same map and plots served by a
+# Bokeh server, which keeps the districts and every scenario's columns in memory. The
+# state/district/parameter/sort/tap callbacks run here in Python, compute the boxplot and
+# bar data with NumPy, and only those small results (patched where they keep their rows) are
+# pushed to the browser. Sessions share one read-only copy of the data (dataset_registry.py);
+# each only holds its selection and the small sources derived from it.
+# The map shows the coarse district geometry at every zoom (no tile pyramid is served).
+# Usage: python serve_maps.py [--scenarios ssp585 ssp245] [--port 5006] [--show] [--cache-dir DIR]
+#    or: bokeh serve serve_maps.py [--args --scenarios ssp245]
+# then open http://localhost:5006/serve_maps (?scenario=ssp245 opens that scenario).
+#
+# Capacity, measured with benchmarks/bench_sessions.py (732 districts, both scenarios, one
+# core): a session holds ~0.9 MB of server memory on top of the shared data, and takes
+# ~135 ms to build plus ~95 ms to serialise its first load (~220 KB, nearly all of it the
+# district geometry). A callback takes 0.1-5 ms on average (up to ~30 ms when the colour
+# mapping changes) and pushes 0.5-12 KB. The server runs callbacks one at a time, so one
+# process sustains a few hundred concurrent sessions with users acting about once a
+# second (~650 callbacks/s), and ~1200 open sessions per GB; opening pages is the tighter
+# limit, at ~4 new sessions per second. Beyond that, run several processes
+# (bokeh serve --num-procs) behind a load balancer with sticky sessions.
+
+BAR_COLOR = '#006ca5'
+HIGHLIGHT_COLOR = '#dc6601'
+NO_PARAMETER_COLOR = "#FFFF9E"
+
+
+# Send only what changed: when `data` has the same columns and rows as `source`, patch the
+# cells that differ, else replace the data
+def update_source(source, data):
+    old = source.data
+    n = len(next(iter(data.values())))
+    if set(old) != set(data) or any(len(old[column]) != n for column in old):
+        source.data = data
+        return
+    patches = {}
+    for column, values in data.items():
+        values = np.asarray(values)
+        changed = np.flatnonzero(np.asarray(old[column]) != values)
+        if len(changed):
+            patches[column] = list(zip(changed.tolist(), values[changed].tolist()))
+    if patches:
+        source.patch(patches)
+
+
+# Build one session's page into `doc`, offering the given scenarios, coloured by the given
+# classification (see build_maps.colour_scales)
+def make_document(doc, scenario_keys, cache_dir=CACHE_DIR, classification='linear', n_classes=None):
+    scenario_keys = list(scenario_keys)
+    dataset = dataset_registry.districts(cache_dir)
+    names = dataset['names']
+    state_rows = dataset['state_rows']
+    all_rows = dataset['rows']
+
+    source = ColumnDataSource(data=dict(xs=dataset['xs'], ys=dataset['ys'], State=dataset['state_names'], District=names))
+    p = map_figure(dataset['bounds'])
+    color_mapper, patches, hover, color_bar = district_glyphs(p, source)
+    p_box, boxplot_source, boxes, p_bar, bar_source = side_plots(SCENARIOS[scenario_keys[0]]['box_color'])
+    scenario_select, parameter_select, description_div, state_select, district_select, sort_select = \
+        control_widgets(scenario_keys, list(dataset['states']))
+    p.add_tools(TapTool())
+
+    # Values of the selected parameter in the selected scenario, or None
+    def selected_values():
+        return dataset_registry.scenario(scenario_select.value, cache_dir).get(parameter_select.value)
+
+    # Display name of the selected parameter (the dropdown's values are the parameter codes)
+    def selected_label():
+        return parameter_labels[parameter_select.value]
+
+    # Selections made here also reach the tap callback, which only handles the user's taps
+    selecting = []
+
+    def select(rows):
+        selecting.append(True)
+        try:
+            source.selected.indices = [int(i) for i in rows]
+        finally:
+            selecting.pop()
+
+    # Boxplot of the selected parameter over `rows`; returns the min and max of those values
+    def show_boxplot(rows, title):
+        q1, q2, q3, lower, upper, min_value, max_value = box_stats(selected_values()[rows])
+        update_source(boxplot_source, dict(q1=[q1], q2=[q2], q3=[q3], upper=[upper], lower=[lower]))
+        p_box.y_range.start = lower
+        p_box.y_range.end = upper
+        p_box.title.text = title
+        return min_value, max_value
+
+    # One bar per district of `rows` (a state), the `highlight` row in another colour
+    def show_bars(rows, state, value_range, highlight=None):
+        values = selected_values()[rows]
+        districts = names[rows].tolist()
+        update_source(bar_source, dict(districts=districts, values=values,
+                                       colors=[HIGHLIGHT_COLOR if i == highlight else BAR_COLOR for i in rows]))
+        p_bar.x_range.factors = districts
+        p_bar.title.text = f"{selected_label()} in {state}"
+        p_bar.y_range.start, p_bar.y_range.end = value_range
+
+    def clear_bars(title):
+        update_source(bar_source, dict(districts=[], values=[], colors=[]))
+        p_bar.x_range.factors = []
+        p_bar.title.text = title
+        p_bar.y_range.start = 0
+        p_bar.y_range.end = 1
+
+    # The callbacks set values of the right types, so Bokeh's property validation (most of
+    # their cost otherwise) is skipped
+    @without_property_validation
+    def on_state(attr, old, state):
+        rows = state_rows.get(state, all_rows[:0])
+        select(rows)
+        # Each option's value is the district's row, so repeated district names never need
+        # to be looked up
+        district_select.options = [(str(i), names[i]) for i in rows]
+        district_select.value = ''
+        if selected_values() is None:
+            return
+
+        value_range = show_boxplot(rows if state != 'India' else all_rows, selected_label())
+        if state == 'India':
+            clear_bars(f"No data for bar plot in {state}")
+        else:
+            show_bars(rows, state, value_range)
+
+    @without_property_validation
+    def on_district(attr, old, value):
+        if value == '':
+            # The state callback clears the district; keep the state's selection and plots
+            return
+        i = int(value)
+        select([i])
+        values = selected_values()
+        if values is None:
+            return
+        update_source(bar_source, dict(districts=[names[i]], values=values[[i]], colors=[HIGHLIGHT_COLOR]))
+        p_bar.x_range.factors = [names[i]]
+        p_bar.title.text = f"{selected_label()} in {names[i]}"
+        p_bar.y_range.start = min(0, float(values[i]))
+
+    @without_property_validation
+    def on_parameter(attr, old, param):
+        values = selected_values()
+        if values is None:
+            patches.glyph.fill_color = NO_PARAMETER_COLOR
+            color_bar.visible = False
+            p_box.visible = False
+            p_bar.visible = False
+            return
+        p_box.visible = True
+        p_bar.visible = True
+
+        # Only the map's value (for the hover tool) and colour class columns are replaced and
+        # sent, not the geometry. (Pointing the fill colour at other columns instead would
+        # change a spec that references the colour mapper, which makes Bokeh re-walk every
+        # model of the session: ~20 ms here.) The classes are precomputed per process, so
+        # recolouring is a palette lookup in the browser.
+        scale = dataset_registry.colour_scales(scenario_select.value, cache_dir, classification, n_classes)[param]
+        source.data.update({'value': values, 'class': scale['classes']})
+        color_mapper.palette = list(scale['palette'])
+        color_mapper.high = len(scale['palette'])
+        patches.glyph.fill_color = dict(field='class', transform=color_mapper)
+        color_bar.ticker.ticks = scale['ticks']
+        color_bar.major_label_overrides = dict(zip(scale['ticks'], scale['labels']))
+        color_bar.title = PARAMETERS[param]['units']
+        color_bar.visible = True
+        hover.tooltips = [("State", "@State"), ("District", "@District"), (selected_label(), "@value")]
+
+        state = state_select.value
+        selected = source.selected.indices
+        row_state = 'India' if state == 'India' else (dataset['state_names'][selected[0]] if selected else state)
+        value_range = show_boxplot(state_rows[row_state] if row_state != 'India' else all_rows, selected_label())
+        if state != 'India':
+            show_bars(state_rows[row_state], row_state, value_range)
+
+    @without_property_validation
+    def on_tap(attr, old, indices):
+        if selecting or not indices:
+            return
+        i = indices[-1]
+        if len(indices) > 1:
+            select([i])
+        if selected_values() is None:
+            return
+        state = dataset['state_names'][i]
+        rows = state_rows[state]
+        value_range = show_boxplot(rows, f"{selected_label()} in {state}")
+        show_bars(rows, state, value_range, highlight=i)
+
+    @without_property_validation
+    def on_sort(attr, old, order):
+        values = np.asarray(bar_source.data['values'])
+        if len(values) == 0:
+            return
+        # NaN values go last either way
+        ranked = np.argsort(-values if order == "Descending" else values, kind='stable')
+        data = bar_source.data
+        update_source(bar_source, {column: np.asarray(data[column])[ranked] for column in ('districts', 'values', 'colors')})
+        p_bar.x_range.factors = list(bar_source.data['districts'])
+
+    @without_property_validation
+    def on_scenario(attr, old, key):
+        scenario = SCENARIOS[key]
+        parameters = scenario_parameters(key)
+        description_div.text = scenario_description(key)
+        for box in boxes:
+            box.glyph.fill_color = scenario['box_color']
+
+        current = parameter_select.value
+        parameter_select.options = ['None'] + [(param, parameter_labels[param]) for param in parameters]
+        following = current if current != 'None' and current in parameters else scenario['initial_param'] or 'None'
+        if following == current:
+            on_parameter('value', current, current)
+        else:
+            parameter_select.value = following
+
+    state_select.on_change('value', on_state)
+    district_select.on_change('value', on_district)
+    parameter_select.on_change('value', on_parameter)
+    source.selected.on_change('indices', on_tap)
+    sort_select.on_change('value', on_sort)
+    scenario_select.on_change('value', on_scenario)
+
+    # Open the scenario named in the URL (?scenario=ssp245), else colour the first one by its
+    # initial parameter
+    request = doc.session_context.request if doc.session_context else None
+    requested = request.arguments.get('scenario', [b''])[0].decode() if request else ''
+    if requested in scenario_keys and requested != scenario_select.value:
+        scenario_select.value = requested
+    else:
+        on_parameter('value', None, parameter_select.value)
+
+    layout = column(row(description_div, scenario_select, state_select, district_select, parameter_select), row(p, sort_select, column(p_bar, p_box)))
+    doc.add_root(layout)
+    doc.title = "Climate Data Map"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the climate data map from a Bokeh server")
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--port', type=int, default=5006)
+    parser.add_argument('--allow-websocket-origin', action='append', help="host[:port] the page may be opened from")
+    parser.add_argument('--show', action='store_true', help="open the page in a browser once serving")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="where to keep the build cache")
+    parser.add_argument('--classes', default='linear', choices=CLASS_METHODS, help="how to split each parameter into colours")
+    parser.add_argument('--num-classes', type=class_count, help="number of colours (default: 256 for linear, 7 otherwise)")
+    return parser.parse_args(argv)
+
+
+if __name__.startswith('bokeh_app_'):
+    # Run by `bokeh serve`, which executes this file for every session; the data lives in
+    # dataset_registry, so it is still loaded once per process
+    args = parse_args(sys.argv[1:])
+    make_document(curdoc(), args.scenarios, args.cache_dir, args.classes, args.num_classes)
+
+elif __name__ == '__main__':
+    args = parse_args()
+    # Load everything before the first session asks for it
+    dataset_registry.districts(args.cache_dir)
+    for key in args.scenarios:
+        dataset_registry.colour_scales(key, args.cache_dir, args.classes, args.num_classes)
+    options = dict(allow_websocket_origin=args.allow_websocket_origin) if args.allow_websocket_origin else {}
+    server = Server({'/serve_maps': lambda doc: make_document(doc, args.scenarios, args.cache_dir, args.classes, args.num_classes)}, port=args.port, **options)
+    server.start()
+    print(f"Serving on http://localhost:{args.port}/serve_maps")
+    if args.show:
+        server.io_loop.add_callback(server.show, '/serve_maps')
+    server.io_loop.start()
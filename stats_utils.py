@@ -0,0 +1,130 @@
+import argparse
+
+import numpy as np
+
+# Order of the values in every row of the stats table
+STATS_FIELDS = ['q1', 'q2', 'q3', 'lower', 'upper', 'min', 'max']
+
+# Colour classifications class_breaks() knows
+CLASS_METHODS = ['linear', 'quantile', 'jenks']
+# Most colour classes a scale can have, so a class fits in a uint8
+MAX_CLASSES = 256
+# Jenks breaks are fitted on an evenly spaced sample of this many of the sorted values when
+# there are more (the exact method is quadratic in the number of values)
+JENKS_SAMPLE = 1000
+
+
+# Quartiles the same way the map pages always computed them: position q * (n + 1) in the
+# sorted values, linear interpolation, clamped to the first/last value.
+# `sorted_values` holds every group back to back, `starts`/`counts` locate each group.
+def _grouped_quantile(sorted_values, starts, counts, q):
+    pos = q * (counts + 1)
+    base = np.floor(pos).astype(int) - 1
+    remainder = pos - base - 1
+    low = sorted_values[starts + np.clip(base, 0, counts - 1)]
+    high = sorted_values[starts + np.clip(base + 1, 0, counts - 1)]
+    edge = np.where(base < 0, sorted_values[starts], sorted_values[starts + counts - 1])
+    inside = (base >= 0) & (base < counts - 1)
+    return np.where(inside, low + remainder * (high - low), edge)
+
+
+# One row of STATS_FIELDS per group of `sorted_values` (laid out as for _grouped_quantile)
+def _grouped_stats(sorted_values, starts, counts):
+    q1 = _grouped_quantile(sorted_values, starts, counts, 0.25)
+    q2 = _grouped_quantile(sorted_values, starts, counts, 0.5)
+    q3 = _grouped_quantile(sorted_values, starts, counts, 0.75)
+    minimum = sorted_values[starts]
+    maximum = sorted_values[starts + counts - 1]
+    iqr = q3 - q1
+    upper = np.minimum(q3 + 1.5 * iqr, maximum)
+    lower = np.maximum(q1 - 1.5 * iqr, minimum)
+    return np.column_stack([q1, q2, q3, lower, upper, minimum, maximum])
+
+
+# Function to precompute boxplot statistics (q1, q2, q3, whiskers, min, max) for every
+# parameter, per group (state) and for the whole layer under `overall_name`, in one sort
+# per parameter. Returns {parameter: {group: [q1, q2, q3, lower, upper, min, max]}}.
+def compute_stats_table(gdf, parameters, group_column='State', overall_name='India'):
+    codes, groups = gdf[group_column].factorize(sort=True)
+    # Whole-layer statistics are computed as one extra group holding every row
+    codes = np.concatenate([codes, np.full(len(codes), len(groups))])
+    names = list(groups) + [overall_name]
+    counts = np.bincount(codes, minlength=len(names))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    table = {}
+    for param in parameters:
+        values = gdf[param].to_numpy(dtype=float)
+        values = np.concatenate([values, values])
+        sorted_values = values[np.lexsort((values, codes))]
+
+        rows = _grouped_stats(sorted_values, starts, counts).round(6).tolist()
+        table[param] = dict(zip(names, rows))
+    return table
+
+
+# Boxplot statistics of one group of values, as a row of the stats table
+def box_stats(values):
+    sorted_values = np.sort(np.asarray(values, dtype=float))
+    return _grouped_stats(sorted_values, np.array([0]), np.array([len(sorted_values)]))[0].round(6).tolist()
+
+
+# Fisher-Jenks natural breaks of `sorted_values`: the split into `n_classes` runs with the
+# least total squared deviation from their means, by dynamic programming over the cost of
+# the first j values in k classes
+def _jenks_breaks(sorted_values, n_classes):
+    if len(sorted_values) > JENKS_SAMPLE:
+        sorted_values = sorted_values[np.linspace(0, len(sorted_values) - 1, JENKS_SAMPLE).astype(int)]
+    n = len(sorted_values)
+    n_classes = min(n_classes, n)
+    sums = np.concatenate([[0], np.cumsum(sorted_values)])
+    squares = np.concatenate([[0], np.cumsum(sorted_values ** 2)])
+    # Squared deviation of sorted_values[i:j] from its mean, for every start i and end j
+    i, j = np.arange(n + 1)[:, None], np.arange(n + 1)[None, :]
+    count = j - i
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviation = squares[j] - squares[i] - (sums[j] - sums[i]) ** 2 / count
+    deviation[count <= 0] = np.inf
+
+    cost = deviation[0]
+    starts = []
+    for _ in range(n_classes - 1):
+        total = cost[:, None] + deviation
+        start = np.argmin(total, axis=0)
+        cost = total[start, np.arange(n + 1)]
+        starts.append(start)
+    # Walk back from the end of the values to where every class starts
+    splits = [n]
+    for start in reversed(starts):
+        splits.append(start[splits[-1]])
+    return np.array([sorted_values[0]] + [sorted_values[k] for k in reversed(splits[1:])] + [sorted_values[-1]])
+
+
+# Class edges (lowest first, one more than there are classes) of `values` for a colour
+# scale: 'linear' splits the range into equal widths, 'quantile' puts the same number of
+# values in every class, 'jenks' uses natural breaks. At most MAX_CLASSES classes.
+def class_breaks(values, n_classes, method='linear'):
+    if not 1 <= n_classes <= MAX_CLASSES:
+        raise ValueError(f"n_classes must be between 1 and {MAX_CLASSES}, got {n_classes}")
+    values = np.sort(np.asarray(values, dtype=float))
+    values = values[~np.isnan(values)]
+    if method == 'linear':
+        return np.linspace(values[0], values[-1], n_classes + 1)
+    if method == 'quantile':
+        return np.quantile(values, np.linspace(0, 1, n_classes + 1))
+    if method == 'jenks':
+        return _jenks_breaks(values, n_classes)
+    raise ValueError(f"unknown classification {method!r}, expected one of {CLASS_METHODS}")
+
+
+# argparse type of the --num-classes options: a number of classes class_breaks() accepts
+def class_count(text):
+    n_classes = int(text)
+    if not 1 <= n_classes <= MAX_CLASSES:
+        raise argparse.ArgumentTypeError(f"must be between 1 and {MAX_CLASSES}, got {n_classes}")
+    return n_classes
+
+
+# Class of every value (uint8, 0 for the lowest class) given the class edges
+def classify(values, breaks):
+    return np.searchsorted(breaks[1:-1], values, side='right').astype(np.uint8)
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from build_maps import KEYS, difference_attributes
+from geo_utils import read_attribute_columns
+from scenarios import DATA_DIR, PERIOD, SCENARIOS
+
+
+DBF = {key: os.path.join(DATA_DIR, f'{key.upper()}_ClimateData_India.dbf') for key in ('ssp585', 'ssp245')}
+
+
+@pytest.fixture
+def difference(monkeypatch, tmp_path):
+    # The shipped layers are attribute tables only, so the scenarios are read from their DBFs
+    for key, path in DBF.items():
+        monkeypatch.setitem(SCENARIOS[key]['layers'], PERIOD, path)
+    districts = read_attribute_columns(DBF['ssp585'], KEYS)
+    districts.attrs['cache_key'] = 'districts'
+    return difference_attributes('ssp585-ssp245', districts, str(tmp_path)).set_index(KEYS)
+
+
+# SSP585's r20/r10 fields are changes w.r.t. the baseline, SSP245's absolute counts: the
+# difference subtracts SSP585's absolute counts instead (32.7 - 32.5 days of R20 and
+# 61.6 - 61.0 days of R10 in Ernakulam's southwest monsoon)
+def test_day_counts_subtract_matching_fields(difference):
+    ernakulam = difference.loc[('KERALA', 'Ernakulam')]
+    assert ernakulam['r20_sw_monsoon'] == pytest.approx(0.2, abs=1e-4)
+    assert ernakulam['r10_sw_monsoon'] == pytest.approx(0.6, abs=1e-4)
+    # Change minus absolute count was negative by tens of days nearly everywhere
+    for param in ('r20_sw_monsoon', 'r20_ne_monsoon', 'r10_sw_monsoon', 'r10_ne_monsoon'):
+        assert difference[param].abs().max() < 5
+
+
+def test_shared_fields_subtract_as_registered(difference):
+    ernakulam = difference.loc[('KERALA', 'Ernakulam')]
+    ssp585, ssp245 = (read_attribute_columns(DBF[key], KEYS + ['TMAX_Annua'], dict(TMAX_Annua='float32'))
+                      .set_index(KEYS).loc[('KERALA', 'Ernakulam')] for key in ('ssp585', 'ssp245'))
+    assert ernakulam['tmax_annual'] == pytest.approx(ssp585['TMAX_Annua'] - ssp245['TMAX_Annua'], abs=1e-4)
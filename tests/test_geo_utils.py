@@ -0,0 +1,16 @@
+import shapely
+
+from geo_utils import simplify_shared_boundaries
+
+
+# A small district with a hole on the edge of a large one: at a coarse tolerance its
+# exterior collapses onto the shared edge, and its hole must be dropped with it
+def test_collapsed_exterior_drops_its_holes():
+    large = shapely.Polygon([(0, 0), (10, 0), (10, 4), (10, 6), (10, 10), (0, 10)])
+    small = shapely.Polygon([(10, 4), (11, 4.2), (11.5, 5), (11, 5.8), (10, 6)],
+                            [[(10.3, 4.8), (10.6, 4.8), (10.6, 5.2), (10.3, 5.2)]])
+    fine, coarse = simplify_shared_boundaries([large, small], [0.01, 2])
+    assert fine[1].equals(small)
+    # Nothing is left of the small district, so it keeps its original geometry
+    assert coarse[1].equals(small)
+    assert coarse[0].equals(large)